@@ -1,31 +1,355 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, g
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, make_response, stream_with_context, abort, has_request_context, send_from_directory
 import sqlite3
+import jinja2
 import os
+import re
+import csv
+import mimetypes
 import functools
+import contextlib
+import shutil
+import tempfile
+import threading
+import time
+import click
+import itertools
 import fake_info
-from werkzeug.security import generate_password_hash, check_password_hash
+import ranking
+import db_pool
+import page_cache
+import importer
+import exporter
+import publisher
+import live
+import metrics
+import passwords
+import assets
+import scoring
+import event_types
+import result_store
+import search
+import write_queue
+import meets
+import records
+import json
 
 app = Flask(__name__, template_folder='build', static_folder='build/static')
+# the template bytecode cache, its folder made by the first template compiled rather than at import
+# where it can't be written (a read-only deploy) templates are only compiled in memory
+class TemplateCache(jinja2.FileSystemBytecodeCache):
+    def load_bytecode(self, bucket):
+        try:
+            super().load_bytecode(bucket)
+        except OSError:
+            pass
+
+    def dump_bytecode(self, bucket):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass
+
+# compiled templates are kept on disk, a restart skips the jinja compiler
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(app.root_path, '.jinja-cache'))
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': TemplateCache(app.config['TEMPLATE_CACHE_DIR'])}
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
-app.config['DATABASE'] = os.path.join(app.root_path, 'sports_day.db')
+app.config['DATABASE'] = os.environ.get('DATABASE', os.path.join(app.root_path, 'sports_day.db'))
+# a generated database copied into place when DATABASE doesn't exist yet, written by `flask build-seed`
+app.config['SEED_DATABASE'] = os.environ.get('SEED_DATABASE', os.path.join(app.root_path, 'seed.db'))
+# connection pool & per-connection sqlite settings
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_POOL_TIMEOUT'] = 10.0
+app.config['DB_MMAP_SIZE'] = 256 * 1024 * 1024
+app.config['DB_CACHE_SIZE'] = -64 * 1024
+app.config['DB_BUSY_TIMEOUT'] = 5000
+# rows per page on the list pages
+app.config['PAGE_SIZE'] = 50
+app.config['MAX_PAGE_SIZE'] = 500
+# rendered list pages kept in memory between writes
+app.config['PAGE_CACHE_SIZE'] = 256
+app.config['PAGE_CACHE_TTL'] = 30.0
+# per-query & per-phase timings served at /metrics, off unless asked for
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED') == '1'
+# werkzeug hash method, e.g. scrypt:16384:8:1 or pbkdf2:sha256:600000
+# stored hashes made with other parameters are redone on the next login
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_QUEUE'] = 32
+# failed logins allowed within the window, per username from one address
+# & per address for all usernames together, high enough for a class behind one NAT address
+# counted in each process: under the pre-forked workers of serve.py an address gets up to workers x these
+app.config['LOGIN_ATTEMPTS'] = 5
+app.config['LOGIN_ATTEMPTS_PER_ADDR'] = 50
+app.config['LOGIN_WINDOW'] = 300.0
+# ASGI mode (asgi.py): threads for the sync routes & sqlite readers for the async ones
+app.config['ASGI_THREADS'] = int(os.environ.get('ASGI_THREADS', 32))
+app.config['ASYNC_DB_READERS'] = 4
+app.config['ASYNC_DB_CONNECTIONS'] = 32
+# fingerprinted files under static/dist never change, browsers keep them for a year
+app.config['ASSET_MAX_AGE'] = 365 * 24 * 3600
+# house & athlete points for 1st, 2nd, 3rd ... place
+app.config['POINTS_PER_PLACE'] = scoring.POINTS_PER_PLACE
+# rank list_results from the in-memory result store instead of sqlite
+app.config['RESULT_STORE'] = os.environ.get('RESULT_STORE', '1') == '1'
+# writes kept in the result_changes log for processes that are catching up
+app.config['CHANGE_LOG_SIZE'] = 10000
+# result entry goes through one writer thread, the writes that queued up during a commit go in the next one
+# a WRITE_BATCH_WINDOW (seconds) also waits that long for more writes, worth it only on slow disks
+app.config['WRITE_QUEUE'] = os.environ.get('WRITE_QUEUE', '1') == '1'
+app.config['WRITE_BATCH_WINDOW'] = float(os.environ.get('WRITE_BATCH_WINDOW', 0))
+app.config['WRITE_BATCH_MAX'] = 64
+app.config['WRITE_QUEUE_SIZE'] = 256
+# durability of the writer's commits: FULL syncs every commit, NORMAL (with WAL) only at checkpoints
+# and may lose the last commits on a power cut, never the database itself
+app.config['WRITE_SYNCHRONOUS'] = os.environ.get('WRITE_SYNCHRONOUS', 'NORMAL')
+# past meets, one database file each, attached read-only when one is looked at
+app.config['ARCHIVE_DIR'] = os.environ.get('ARCHIVE_DIR', os.path.join(app.root_path, 'meets'))
+# GET requests read through connections opened with mode=ro (set by serve.py)
+app.config['DB_READONLY_READERS'] = False
+
+# sqlite settings applied to every new connection
+# WAL lets readers keep going while an admin is writing
+def db_pragmas():
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('foreign_keys', 'ON'),
+        ('mmap_size', app.config['DB_MMAP_SIZE']),
+        ('cache_size', app.config['DB_CACHE_SIZE']),
+        ('busy_timeout', app.config['DB_BUSY_TIMEOUT']),
+    ]
+
+# create the connection pool for the configured database
+# the read-only pool skips journal_mode, a reader can't change it
+def get_pool(readonly=False):
+    name = 'db_readers' if readonly else 'db_pool'
+    pool = app.extensions.get(name)
+    if pool is None or pool.database != app.config['DATABASE']:
+        if pool:
+            pool.close()
+        pool = db_pool.ConnectionPool(
+            app.config['DATABASE'],
+            size=app.config['DB_POOL_SIZE'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            pragmas=[p for p in db_pragmas() if not readonly or p[0] != 'journal_mode'],
+            factory=metrics.TimedConnection if app.config['METRICS_ENABLED'] else sqlite3.Connection,
+            readonly=readonly
+        )
+        app.extensions[name] = pool
+    return pool
+
+# the group commit writer of this process, with its own connection
+def get_writer():
+    writer = app.extensions.get('db_writer')
+    if writer is None or writer.pool.database != app.config['DATABASE'] or writer.pid != os.getpid():
+        if writer and writer.pid == os.getpid():
+            writer.shutdown()
+        ensure_db()
+        pool = db_pool.ConnectionPool(
+            app.config['DATABASE'],
+            size=1,
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            pragmas=[(name, app.config['WRITE_SYNCHRONOUS'] if name == 'synchronous' else value)
+                     for name, value in db_pragmas()],
+            factory=metrics.TimedConnection if app.config['METRICS_ENABLED'] else sqlite3.Connection
+        )
+        writer = write_queue.WriteQueue(
+            pool,
+            window=app.config['WRITE_BATCH_WINDOW'],
+            max_batch=app.config['WRITE_BATCH_MAX'],
+            max_pending=app.config['WRITE_QUEUE_SIZE']
+        )
+        app.extensions['db_writer'] = writer
+    return writer
+
+# fn(db, *args) as one write, committed when this returns
+# through the group commit writer, or on the request's own connection when it is off
+def write(fn, *args):
+    if app.config['WRITE_QUEUE']:
+        return get_writer().submit(fn, *args)
+    db = get_db()
+    try:
+        result = fn(db, *args)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+
+# close every pooled connection, a forked worker must open its own
+# the writer thread doesn't survive a fork either, a child only drops it
+def close_pools():
+    writer = app.extensions.pop('db_writer', None)
+    if writer and writer.pid == os.getpid():
+        writer.shutdown()
+    if writer:
+        writer.pool.close()
+    for name in ('db_pool', 'db_readers'):
+        pool = app.extensions.pop(name, None)
+        if pool:
+            pool.close()
+
+# too many writes waiting for the writer, the official can retry in a moment
+@app.errorhandler(write_queue.WriteQueueFull)
+def write_queue_full(e):
+    response = make_response("The server is busy, try again in a moment", 503)
+    response.retry_after = 1
+    return response
 
-# ensure the database directory exists and connect database
+# borrow a database connection for this request
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(app.config['DATABASE'])
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA foreign_keys = ON")
+        ensure_db()
+        g.db_readonly = bool(
+            app.config['DB_READONLY_READERS'] and has_request_context() and request.method in ('GET', 'HEAD')
+        )
+        g.db = get_pool(g.db_readonly).acquire()
     return g.db
 
-# disconnect database
+# give the connection back to the pool
 @app.teardown_appcontext
 def close_db(exc):
     db = g.pop('db', None)
     if db:
-        db.close()
+        get_pool(g.pop('db_readonly', False)).release(db)
+
+# time the whole request when metrics are on
+@app.before_request
+def start_timer():
+    if app.config['METRICS_ENABLED']:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def stop_timer(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.registry.observe(
+            'sports_day_request_seconds',
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            status=response.status_code
+        )
+    return response
+
+# time one phase of a request (query, transform, render)
+def phase(name):
+    if not app.config['METRICS_ENABLED']:
+        return contextlib.nullcontext()
+    return metrics.timer('sports_day_phase_seconds', endpoint=request.endpoint, phase=name)
+
+# password hashing off the request threads & login throttling
+hasher = passwords.Hasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    app.config['PASSWORD_HASH_WORKERS'],
+    app.config['PASSWORD_HASH_QUEUE']
+)
+login_limiter = passwords.LoginLimiter(app.config['LOGIN_ATTEMPTS'], app.config['LOGIN_WINDOW'])
+address_limiter = passwords.LoginLimiter(app.config['LOGIN_ATTEMPTS_PER_ADDR'], app.config['LOGIN_WINDOW'])
+
+# cache for the rendered results & events pages
+pages = page_cache.PageCache(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+
+# live result updates pushed to the results pages
+live_updates = live.Broker()
+
+# the routes' own statements, also run by check-query-plans
+USER_SQL = "SELECT * FROM Users WHERE username=?"
+ATHLETE_SQL = "SELECT * FROM Athletes WHERE athlete_id=?"
+EVENT_SQL = "SELECT * FROM Events WHERE event_id=?"
+RESULT_ROW_SQL = """
+    SELECT r.*, a.name as athlete_name, e.event as event_name
+    FROM results r
+    JOIN Athletes a ON a.athlete_id = r.athlete_id
+    JOIN Events e ON e.event_id = r.event_id
+    WHERE r.result_id=?
+"""
+UPDATE_RESULT_SQL = "UPDATE results SET result=?, status=? WHERE result_id=?"
+DELETE_RESULT_SQL = "DELETE FROM results WHERE result_id=? RETURNING event_id"
+UPDATE_EVENT_SQL = "UPDATE Events SET status=? WHERE event_id=?"
+REHASH_SQL = "UPDATE Users SET password=? WHERE username=?"
+INSERT_RESULT_SQL = "INSERT INTO results(athlete_id,event_id,result,status) VALUES (?,?,?,?)"
+ATHLETE_POINTS_SQL = "SELECT points FROM athlete_points WHERE athlete_id=?"
+TRIM_CHANGES_SQL = "DELETE FROM result_changes WHERE seq <= (SELECT MAX(seq) FROM result_changes) - ?"
+
+# event name -> event type, loaded once per database
+def get_event_types():
+    cached = app.extensions.get('event_types')
+    if cached is None or cached[0] != app.config['DATABASE']:
+        cached = app.extensions['event_types'] = (app.config['DATABASE'], event_types.load(get_db()))
+    return cached[1]
+
+# move the points of the changed events onto the house & athlete totals
+# called before the commit, so the totals are written with the results
+def rescore(db, *event_ids):
+    for event_id in event_ids:
+        scoring.rescore_event(db, event_id, app.config['POINTS_PER_PLACE'])
+        records.update_event(db, event_id)
+    # the change log only needs to reach back as far as a slow process could be behind
+    db.execute(TRIM_CHANGES_SQL, (app.config['CHANGE_LOG_SIZE'],))
+
+# every event's ranked results in columns, shared by the request threads
+results = result_store.ResultStore()
+
+# the results of an event were written
+# drop the cached pages that could show it & push the new standings to live clients
+def results_changed(db, event_id):
+    event = db.execute(EVENT_SQL, (event_id,)).fetchone()
+    if not event:
+        return
+    pages.invalidate(event)
+
+    # one query per change, however many clients are listening
+    if live_updates.has_subscribers():
+        if app.config['RESULT_STORE']:
+            results.refresh(db)
+            rows = results.event_results(event_id)
+        else:
+            rows = ranking.event_results(db, event_id)
+        live_updates.publish(json.dumps({
+            'event_id': event_id,
+            'event_status': event['status'],
+            'rows': [{
+                'result_id': row['result_id'],
+                'rank': row['rank'],
+                'athlete_id': row['athlete_id'],
+                'name': row['name'],
+                'house': row['house'],
+                'result': row['result'],
+                'status': row['status'],
+            } for row in rows]
+        }))
+
+# serve a list page from the page cache, or render & cache it
+# scope holds the event, sex & grade filters that decide which events the page can show
+def cached_page(scope, render):
+    args = tuple(sorted((k, v.strip()) for k, v in request.args.items(multi=True) if v.strip()))
+    key = (request.endpoint, session.get('role'), args)
+    entry = pages.get(key)
+    if entry is None:
+        # a write committed while rendering keeps this page out of the cache
+        generation = pages.generation()
+        entry = pages.set(key, render(), scope, generation)
+
+    # an unchanged page costs the browser a 304 and us no database work
+    if request.if_none_match.contains(entry.etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(entry.value)
+    response.set_etag(entry.etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
+
+# the sample size & mix can be changed to build bigger databases for benchmarks
+# the database is made from scratch, so opening it mustn't prepare it first
+def init_db(athletes=120, seed=None, events_per_athlete=2, heats=1):
+    with preparing(app.config['DATABASE']):
+        generate_db(athletes, seed=seed, events_per_athlete=events_per_athlete, heats=heats)
 
 # create tables & insert data
-def init_db():
+def generate_db(athletes, seed, events_per_athlete, heats):
     print("initializing database...")
     db = get_db()
     db.executescript("""
@@ -33,6 +357,16 @@ def init_db():
         DROP TABLE IF EXISTS Events;
         DROP TABLE IF EXISTS Athletes;
         DROP TABLE IF EXISTS Users;
+        DROP TABLE IF EXISTS points_table;
+        DROP TABLE IF EXISTS event_points;
+        DROP TABLE IF EXISTS athlete_points;
+        DROP TABLE IF EXISTS house_points;
+        DROP TABLE IF EXISTS event_types;
+        DROP TABLE IF EXISTS result_changes;
+        DROP TABLE IF EXISTS result_ranks;
+        DROP TABLE IF EXISTS athletes_fts;
+        DROP TABLE IF EXISTS events_fts;
+        DROP TABLE IF EXISTS records;
         
         CREATE TABLE Users (
             username TEXT PRIMARY KEY,
@@ -68,20 +402,228 @@ def init_db():
     # sample username & password
     # hash the password
     users = [
-        ('admin', generate_password_hash('adminpass'), 'admin'),
-        ('user', generate_password_hash('userpass'), 'user')
+        ('admin', hasher.hash('adminpass'), 'admin'),
+        ('user', hasher.hash('userpass'), 'user')
     ]
     db.executemany("INSERT INTO Users VALUES (?,?,?)", users)
 
-    ath, ev, res = fake_info.sample(120)
-    db.executemany("INSERT INTO Athletes VALUES (?,?,?,?,?)", ath)
-    db.executemany("INSERT INTO Events VALUES (?,?,?,?,?)", ev)
-    db.executemany("INSERT INTO results(athlete_id,event_id,result,status) VALUES (?,?,?,?)", res)
+    # indexes come from the migrations, after the bulk insert
+    fake_info.write_sample(db, athletes, seed=seed, events_per_athlete=events_per_athlete, heats=heats)
+    app.extensions.pop('event_types', None)
+    results.clear()
+
+    # the tables are brand new, so run every migration on them
+    db.execute("PRAGMA user_version = 0")
+    migrate_db(db)
+
+# a migration can't go ahead without someone fixing the data by hand
+class MigrationBlocked(Exception):
+    pass
+
+# migration 1 makes results unique per athlete & event
+# which duplicate to keep is the officials' call, so nothing is deleted here
+def check_duplicate_results(db):
+    duplicates = db.execute("""
+        SELECT athlete_id, event_id, GROUP_CONCAT(result_id, ', ') AS result_ids
+        FROM results
+        GROUP BY athlete_id, event_id
+        HAVING COUNT(*) > 1
+        ORDER BY athlete_id, event_id
+    """).fetchall()
+    if duplicates:
+        lines = [f"  athlete {d['athlete_id']}, event {d['event_id']}: results {d['result_ids']}" for d in duplicates]
+        raise MigrationBlocked(
+            f"{len(duplicates)} athlete & event pairs have more than one result, "
+            "delete all but one of each before migrating:\n" + "\n".join(lines)
+        )
+
+# schema migrations, applied in order
+# PRAGMA user_version stores how many of them the database has already run
+MIGRATIONS = [
+    # 1: secondary indexes for the route queries
+    # results becomes unique per athlete & event, migrate_db checks for duplicates first
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_results_athlete_event ON results(athlete_id, event_id);
+    CREATE INDEX IF NOT EXISTS idx_results_event ON results(event_id);
+    CREATE INDEX IF NOT EXISTS idx_results_status ON results(status);
+    CREATE INDEX IF NOT EXISTS idx_athletes_house ON Athletes(house, sex, grade);
+    CREATE INDEX IF NOT EXISTS idx_athletes_sex_grade ON Athletes(sex, grade);
+    CREATE INDEX IF NOT EXISTS idx_athletes_grade ON Athletes(grade);
+    CREATE INDEX IF NOT EXISTS idx_events_event ON Events(event, sex, grade);
+    CREATE INDEX IF NOT EXISTS idx_events_sex_grade ON Events(sex, grade, status);
+    CREATE INDEX IF NOT EXISTS idx_events_grade ON Events(grade, status);
+    CREATE INDEX IF NOT EXISTS idx_events_status ON Events(status);
+    """,
+    # 2: points totals, kept up to date on every write (filled in by scoring.sync_points_table)
+    """
+    CREATE TABLE IF NOT EXISTS points_table (
+        place INTEGER PRIMARY KEY,
+        points INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS event_points (
+        result_id INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL,
+        athlete_id TEXT NOT NULL,
+        house TEXT NOT NULL,
+        points INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_event_points_event ON event_points(event_id);
+    CREATE TABLE IF NOT EXISTS athlete_points (
+        athlete_id TEXT PRIMARY KEY,
+        house TEXT NOT NULL,
+        points INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_athlete_points_points ON athlete_points(points);
+    CREATE TABLE IF NOT EXISTS house_points (
+        house TEXT PRIMARY KEY,
+        points INTEGER NOT NULL DEFAULT 0
+    );
+    """,
+    # 3: event types, how each event is measured & which way it ranks
+    # events without a known type keep the old rule, times for '... meters' & distances otherwise
+    event_types.seed_sql() + """
+    INSERT OR IGNORE INTO event_types(event, kind, unit, direction)
+    SELECT DISTINCT event,
+           CASE WHEN event LIKE '%meters%' THEN 'timed' ELSE 'measured' END,
+           CASE WHEN event LIKE '%meters%' THEN 's' ELSE 'm' END,
+           CASE WHEN event LIKE '%meters%' THEN 1 ELSE -1 END
+    FROM Events;
+    """,
+    # 4: a log of the events whose results changed, read by the in-memory result store
+    """
+    CREATE TABLE IF NOT EXISTS result_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        event_id TEXT NOT NULL
+    );
+    CREATE TRIGGER IF NOT EXISTS results_insert_log AFTER INSERT ON results BEGIN
+        INSERT INTO result_changes(event_id) VALUES (NEW.event_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS results_update_log AFTER UPDATE ON results BEGIN
+        INSERT INTO result_changes(event_id) SELECT OLD.event_id UNION SELECT NEW.event_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS results_delete_log AFTER DELETE ON results BEGIN
+        INSERT INTO result_changes(event_id) VALUES (OLD.event_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_update_log AFTER UPDATE ON Events BEGIN
+        INSERT INTO result_changes(event_id) SELECT OLD.event_id UNION SELECT NEW.event_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS athletes_update_log AFTER UPDATE ON Athletes BEGIN
+        INSERT INTO result_changes(event_id) SELECT DISTINCT event_id FROM results WHERE athlete_id = NEW.athlete_id;
+    END;
+    """,
+    # 5: every result's rank by athlete, so an athlete's page doesn't re-rank their events
+    # emptying points_table makes migrate_db rebuild the totals, which fills the index
+    """
+    CREATE TABLE IF NOT EXISTS result_ranks (
+        result_id INTEGER PRIMARY KEY,
+        event_id TEXT NOT NULL,
+        athlete_id TEXT NOT NULL,
+        rank INTEGER,
+        position INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_result_ranks_athlete ON result_ranks(athlete_id, event_id);
+    CREATE INDEX IF NOT EXISTS idx_result_ranks_event ON result_ranks(event_id);
+    DELETE FROM points_table;
+    """,
+    # 6: full text search over athletes & events, for the name filters & the typeahead
+    search.SCHEMA,
+    # 7: all-time records, the baseline from archived meets is kept when the database is re-seeded
+    records.SCHEMA,
+]
+
+# bring the database schema up to the latest migration
+def migrate_db(db):
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1 <= len(MIGRATIONS):
+        check_duplicate_results(db)
+    for i, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        print(f"applying migration {i}...")
+        # executescript commits first, so the version bump runs in the script itself
+        db.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {i};\nCOMMIT;")
+
+    # fills the points totals after migration 2 & rebuilds them when POINTS_PER_PLACE changes
+    if scoring.sync_points_table(db, app.config['POINTS_PER_PLACE']):
+        print("rebuilding points totals...")
+    # starts the records after migration 7 from the baseline & the results already entered
+    if version < 7 <= len(MIGRATIONS):
+        records.rebuild(db)
     db.commit()
 
-if not os.path.exists(app.config['DATABASE']):
+# logical static name -> fingerprinted copy, written by `flask build-assets`
+asset_manifest = assets.load_manifest(app.static_folder)
+
+# url of a static file, its fingerprinted copy once built
+# a vendored file that isn't downloaded yet still comes from its CDN
+@app.template_global()
+def asset_url(filename):
+    if filename in asset_manifest:
+        return url_for('static', filename=asset_manifest[filename])
+    if filename in assets.CDN and not os.path.exists(os.path.join(app.static_folder, filename)):
+        return assets.CDN[filename]
+    return url_for('static', filename=filename)
+
+# compile every template now instead of on the first request that needs it
+def precompile_templates():
+    for name in app.jinja_env.list_templates(filter_func=lambda n: n.endswith('.html')):
+        app.jinja_env.get_template(name)
+
+# a new database starts as a copy of the seed, written next to it first & renamed into place
+def copy_seed(seed, database):
+    print("copying the seed database...")
+    tmp = f"{database}.{os.getpid()}.tmp"
+    shutil.copyfile(seed, tmp)
+    os.replace(tmp, database)
+
+# create or migrate the database, only generated from scratch when there is no seed to copy
+def prepare_db():
+    database = app.config['DATABASE']
+    created = not os.path.exists(database)
+    if created and os.path.exists(app.config['SEED_DATABASE']):
+        copy_seed(app.config['SEED_DATABASE'], database)
+        created = False
     with app.app_context():
-        init_db()
+        # the writable pool, even when a GET request is the first to open the database
+        g.db_readonly = False
+        g.db = get_pool().acquire()
+        if created:
+            init_db()
+        else:
+            migrate_db(g.db)
+
+# databases this process already created or migrated, and the ones it is working on
+prepared_databases = set()
+preparing_databases = set()
+prepare_lock = threading.RLock()
+
+# holds other threads back while database is prepared, yields whether this caller is the one to do it
+# the lock is reentrant, the preparing thread's own connections come through here again
+@contextlib.contextmanager
+def preparing(database):
+    with prepare_lock:
+        first = database not in prepared_databases and database not in preparing_databases
+        if not first:
+            yield False
+            return
+        preparing_databases.add(database)
+        try:
+            yield True
+            prepared_databases.add(database)
+        finally:
+            preparing_databases.discard(database)
+
+# prepare the configured database the first time this process connects to it, instead of at import
+def ensure_db():
+    database = app.config['DATABASE']
+    if database in prepared_databases:
+        return
+    with preparing(database) as first:
+        if first:
+            prepare_db()
+
+# the work importing the app used to do, for servers to run once before taking requests
+def warm_up():
+    ensure_db()
+    precompile_templates()
 
 # authentication decorators
 def login_required(f):
@@ -109,17 +651,39 @@ def login():
     if request.method == 'POST':
         username = request.form['username'].strip()
         password = request.form['password']
+        # throttled before any hashing, so guessing can't eat the cpu
+        # typos on one account only lock that account out for that address
+        key = (username, request.remote_addr)
+        retry_after = max(login_limiter.retry_after(key), address_limiter.retry_after(request.remote_addr))
+        if retry_after:
+            flash("Too many failed logins, try again later", "error")
+            response = make_response(render_template('login.html'), 429)
+            response.retry_after = int(retry_after) + 1
+            return response
+
         db = get_db()
-        user = db.execute(
-            "SELECT * FROM Users WHERE username=?",
-            (username,)
-        ).fetchone()
-        
-        if user and check_password_hash(user['password'], password):
+        user = db.execute(USER_SQL, (username,)).fetchone()
+
+        try:
+            valid = bool(user) and hasher.check(user['password'], password)
+            # move the stored hash onto the configured parameters
+            if valid and hasher.needs_rehash(user['password']):
+                db.execute(REHASH_SQL, (hasher.hash(password), user['username']))
+                db.commit()
+        except passwords.HasherBusy:
+            flash("The server is busy, try again in a moment", "error")
+            response = make_response(render_template('login.html'), 503)
+            response.retry_after = 1
+            return response
+
+        if valid:
+            login_limiter.succeeded(key)
             session['username'] = user['username']
             session['role'] = user['role']
             flash(f"Welcome, {username}", "success")
             return redirect(url_for('index'))
+        login_limiter.failed(key)
+        address_limiter.failed(request.remote_addr)
         flash("Incorrect username or password", "error")
     return render_template('login.html')
 
@@ -158,33 +722,25 @@ def add_result():
             flash("Result must be a number larger than 0", "error")
             return redirect(url_for('add_result'))
         
-        # check whether the athlete_id and event_id exist in results
-        rid = db.execute("""
-        SELECT result_id FROM results
-        WHERE athlete_id=? AND event_id=?
-        """, (ath_id, ev_id)).fetchone()
-        
-        if rid:
-            flash("Result already exists for this athlete and event", "error")
-            return redirect(url_for('add_result'))
-        
         status = request.form['status']
 
-        athlete = db.execute(
-            "SELECT * FROM Athletes WHERE athlete_id=?", (ath_id,)
-        ).fetchone()
-        event = db.execute(
-            "SELECT * FROM Events WHERE event_id=?", (ev_id,)
-        ).fetchone()
+        athlete = db.execute(ATHLETE_SQL, (ath_id,)).fetchone()
+        event = db.execute(EVENT_SQL, (ev_id,)).fetchone()
         
         # check whether the athlete_id and event_id are found
         # also check whether the sex and grade of the athlete match the event's
+        # and the result, rounded to its event type's precision, is in the valid range of the event type
+        event_type = event and get_event_types().get(event['event'])
+        result = event_types.round_result(event_type, result)
+        range_error = event and event_types.check_result(event_type, result)
         if not athlete:
             flash("Athlete ID not found", "error")
         elif not event:
             flash("Event ID not found", "error")
         elif athlete['sex'] != event['sex'] or athlete['grade'] != event['grade']:
             flash("Sex/grade mismatch between athlete & event", "error")
+        elif range_error:
+            flash(range_error, "error")
         else:
             # check whether the event has started
             event_status = event['status']
@@ -192,16 +748,57 @@ def add_result():
                 flash("Cannot add result to an event that has not started", "error")
                 return redirect(url_for('add_result'))
             
-            db.execute(
-                "INSERT INTO results(athlete_id,event_id,result,status) VALUES (?,?,?,?)",
-                (ath_id, ev_id, result, status)
-            )
-            db.commit()
+            def insert(db):
+                rid = db.execute(INSERT_RESULT_SQL, (ath_id, ev_id, result, status)).lastrowid
+                rescore(db, ev_id)
+                return rid
+
+            # the unique (athlete_id, event_id) index rejects duplicated results
+            try:
+                rid = write(insert)
+                results_changed(db, ev_id)
+            except sqlite3.IntegrityError as e:
+                if 'UNIQUE' in str(e):
+                    flash("Result already exists for this athlete and event", "error")
+                else:
+                    flash("Invalid result status", "error")
+                return redirect(url_for('add_result'))
             flash("Result added", "success")
+            if records.holds_record(db, rid):
+                flash(f"New record in {event['event']} {event['sex']} {event['grade']}!", "success")
             return redirect(url_for('list_results'))
 
     return render_template('add_result.html')
 
+# bulk import results from a csv / json file
+@app.route('/results/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_results():
+    errors = []
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Choose a file to import", "error")
+            return redirect(url_for('import_results'))
+
+        fmt = request.form.get('format') or importer.guess_format(upload.filename)
+        db = get_db()
+        try:
+            inserted, failed, errors, event_ids = importer.import_results(
+                db, importer.read_rows(upload.stream, fmt), get_event_types(),
+                before_commit=lambda ids: rescore(db, *ids)
+            )
+        except (ValueError, csv.Error) as e:
+            flash(f"Could not read the file: {e}", "error")
+            return redirect(url_for('import_results'))
+
+        for ev_id in event_ids:
+            results_changed(db, ev_id)
+        flash(f"Imported {inserted} results, {failed} rows rejected", "success" if not failed else "error")
+
+    return render_template('import_results.html', errors=errors)
+
 # edit result in results
 @app.route('/results/edit/<int:rid>', methods=['GET', 'POST'])
 @login_required
@@ -209,13 +806,7 @@ def add_result():
 def edit_result(rid):
     # ensure the result is found
     db = get_db()
-    row = db.execute("""
-        SELECT r.*, a.name as athlete_name, e.event as event_name
-        FROM results r
-        JOIN Athletes a ON a.athlete_id = r.athlete_id
-        JOIN Events e ON e.event_id = r.event_id
-        WHERE r.result_id=?
-    """, (rid,)).fetchone()
+    row = db.execute(RESULT_ROW_SQL, (rid,)).fetchone()
     
     if not row:
         flash("Result not found", "error")
@@ -229,15 +820,25 @@ def edit_result(rid):
             if result <= 0:
                 flash("Result must be a number larger than 0", "error")
                 return render_template('edit_result.html', row=row)
+
+            event_type = get_event_types().get(row['event_name'])
+            result = event_types.round_result(event_type, result)
+            range_error = event_types.check_result(event_type, result)
+            if range_error:
+                flash(range_error, "error")
+                return render_template('edit_result.html', row=row)
             
             status = request.form['status']
             
             # update the result
-            db.execute(
-                "UPDATE results SET result=?, status=? WHERE result_id=?",(result, status, rid)
-            )
-            db.commit()
+            def update(db):
+                db.execute(UPDATE_RESULT_SQL, (result, status, rid))
+                rescore(db, row['event_id'])
+            write(update)
+            results_changed(db, row['event_id'])
             flash("Result updated successfully", "success")
+            if records.holds_record(db, rid):
+                flash(f"New record in {row['event_name']}!", "success")
             return redirect(url_for('list_results'))
         except ValueError:
             flash("Result must be a valid number", "error")
@@ -250,13 +851,20 @@ def edit_result(rid):
 @admin_required
 def delete_result(rid):
     db = get_db()
-    # ensure the result exist
+
+    def delete(db):
+        deleted = db.execute(DELETE_RESULT_SQL, (rid,)).fetchall()
+        # ensure the result exist
+        if deleted:
+            rescore(db, deleted[0]['event_id'])
+            return deleted[0]['event_id']
+
     try:
-        db.execute("DELETE FROM results WHERE result_id=?", (rid,))
-        db.commit()
+        event_id = write(delete)
+        if event_id:
+            results_changed(db, event_id)
         flash("Result deleted successfully", "success")
-    except Exception as e:
-        db.rollback()
+    except sqlite3.Error as e:
         flash(f"Error deleting result: {str(e)}", "error")
     return redirect(url_for('list_results'))
 
@@ -266,7 +874,7 @@ def delete_result(rid):
 @admin_required
 def edit_event(event_id):
     db = get_db()
-    event = db.execute("SELECT * FROM Events WHERE event_id=?", (event_id,)).fetchone()
+    event = db.execute(EVENT_SQL, (event_id,)).fetchone()
     if not event:
         flash("Event not found", "error")
         return redirect(url_for('list_events'))
@@ -277,29 +885,53 @@ def edit_event(event_id):
         if new_status not in ('Completed', 'Not yet started'):
             flash("Invalid status selected", "error")
             return render_template('edit_event.html', event=event)
+        def update(db):
+            db.execute(UPDATE_EVENT_SQL, (new_status, event_id))
+            rescore(db, event_id)
+
         try:
-            db.execute("UPDATE Events SET status=? WHERE event_id=?", (new_status, event_id))
-            db.commit()
+            write(update)
+            results_changed(db, event_id)
             flash("Event status updated successfully", "success")
             return redirect(url_for('list_events'))
-        except Exception as e:
-            db.rollback()
+        except sqlite3.Error as e:
             flash(f"Error updating event: {str(e)}", "error")
             return render_template('edit_event.html', event=event)
 
     return render_template('edit_event.html', event=event)
 
-# show athletes table
-@app.route('/athletes')
-@login_required
-@admin_required
-def list_athletes():
-    # filter function
-    athlete_id = request.args.get('athlete_id', '').strip()
-    house = request.args.get('house', '')
-    sex = request.args.get('sex', '')
-    grade = request.args.get('grade', '')
-    
+# page size & keyset cursor of a list page
+def page_args():
+    try:
+        per_page = int(request.args.get('per_page', app.config['PAGE_SIZE']))
+    except ValueError:
+        per_page = app.config['PAGE_SIZE']
+    per_page = max(1, min(per_page, app.config['MAX_PAGE_SIZE']))
+    return per_page, request.args.get('after', '')
+
+# the results pages (current & archived) page by a keyset cursor on the ranking order
+def results_page_args():
+    per_page, after = page_args()
+    return per_page, ranking.parse_cursor(after)
+
+# the next page's cursor as it goes in the url
+def results_cursor(cursor):
+    return cursor and ranking.cursor_text(cursor)
+
+# links to the first & next page, keeping the current filters
+def pagination(current_filters, next_cursor):
+    args = {key: value for key, value in current_filters.items() if value}
+    if 'per_page' in request.args:
+        args['per_page'] = request.args['per_page']
+    args.update(request.view_args or {})
+    return {
+        'first_url': url_for(request.endpoint, **args) if request.args.get('after') else None,
+        'next_url': url_for(request.endpoint, after=next_cursor, **args) if next_cursor else None,
+    }
+
+# build the sql behind the athletes table
+# after & limit page through the athletes in athlete_id order
+def athletes_query(athlete_id='', house='', sex='', grade='', after='', limit=None, name=''):
     query = "SELECT * FROM Athletes"
     where_filters = []
     params = []
@@ -307,6 +939,10 @@ def list_athletes():
     if athlete_id:
         where_filters.append("athlete_id=?")
         params.append(athlete_id)
+    if name and search.match_query(name):
+        # words starting the athlete's name or id, through the full text index
+        where_filters.append("rowid IN (SELECT rowid FROM athletes_fts WHERE athletes_fts MATCH ?)")
+        params.append(search.match_query(name))
     if house:
         where_filters.append("house=?")
         params.append(house)
@@ -316,45 +952,70 @@ def list_athletes():
     if grade:
         where_filters.append("grade=?")
         params.append(grade)
+    if after:
+        where_filters.append("athlete_id>?")
+        params.append(after)
     
     # add condition in the filter function to the sql
     if where_filters:
         query += " WHERE " + " AND ".join(where_filters)
     
-    # create dropdown list for filtering
-    db = get_db()
-    athletes = db.execute(query, params).fetchall()
-    
-    return render_template('list_athletes.html',
-            athletes=athletes,
-            houses=['Red', 'Blue', 'Green', 'Yellow'],
-            sexes=['Boys', 'Girls'],
-            grades=['A', 'B', 'C'],
-            current_filters={
-                'athlete_id': athlete_id, 
-                'house': house, 
-                'sex': sex, 
-                'grade': grade
-            }
-    )
+    query += " ORDER BY athlete_id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
 
-# show events table
-@app.route('/events')
+# show athletes table
+@app.route('/athletes')
 @login_required
-def list_events():
+@admin_required
+def list_athletes():
     # filter function
-    event_name = request.args.get('event_name', '').strip()
+    athlete_id = request.args.get('athlete_id', '').strip()
+    name = request.args.get('name', '').strip()
+    house = request.args.get('house', '')
     sex = request.args.get('sex', '')
     grade = request.args.get('grade', '')
-    status = request.args.get('status', '')
+    current_filters = {
+        'athlete_id': athlete_id, 
+        'name': name,
+        'house': house, 
+        'sex': sex, 
+        'grade': grade
+    }
+    
+    # fetch one extra row to know whether there is a next page
+    per_page, after = page_args()
+    query, params = athletes_query(athlete_id, house, sex, grade, after=after, limit=per_page + 1, name=name)
+    
+    # create dropdown list for filtering
+    db = get_db()
+    with phase('query'):
+        athletes = db.execute(query, params).fetchall()
+    next_cursor = athletes[per_page - 1]['athlete_id'] if len(athletes) > per_page else None
     
+    with phase('render'):
+        return render_template('list_athletes.html',
+                athletes=athletes[:per_page],
+                houses=['Red', 'Blue', 'Green', 'Yellow'],
+                sexes=['Boys', 'Girls'],
+                grades=['A', 'B', 'C'],
+                current_filters=current_filters,
+                page=pagination(current_filters, next_cursor)
+        )
+
+# build the sql behind the events table
+# after & limit page through the events in event_id order
+def events_query(event_name='', sex='', grade='', status='', after='', limit=None):
     query = "SELECT * FROM Events"
     where_filters = []
     params = []
     
-    if event_name:
-        where_filters.append("event LIKE ?")
-        params.append(f"%{event_name}%")
+    if event_name and search.match_query(event_name):
+        # words starting the event name, through the full text index
+        where_filters.append("rowid IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+        params.append(search.match_query(event_name))
     if sex:
         where_filters.append("sex=?")
         params.append(sex)
@@ -364,164 +1025,539 @@ def list_events():
     if status:
         where_filters.append("status=?")
         params.append(status)
+    if after:
+        where_filters.append("event_id>?")
+        params.append(after)
     
     # add condition in the filter function to the sql
     if where_filters:
         query += " WHERE " + " AND ".join(where_filters)
     
     query += " ORDER BY event_id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
 
-    # create dropdown list for filtering
-    db = get_db()
-    events = db.execute(query, params).fetchall()
-    distinct_events = db.execute("SELECT DISTINCT event FROM Events ORDER BY event_id").fetchall()
-
-    return render_template('list_events.html',
-            events=events,
-            distinct_events=distinct_events,
-            sexes=['Boys', 'Girls'],
-            grades=['A', 'B', 'C'],
-            statuses=['Completed', 'Not yet started'],
-            current_filters={
-                'event_name': event_name, 
-                'sex': sex, 
-                'grade': grade, 
-                'status': status
-            }
-    )
+# show events table
+@app.route('/events')
+@login_required
+def list_events():
+    # filter function
+    event_name = request.args.get('event_name', '').strip()
+    sex = request.args.get('sex', '')
+    grade = request.args.get('grade', '')
+    status = request.args.get('status', '')
+    current_filters = {
+        'event_name': event_name, 
+        'sex': sex, 
+        'grade': grade, 
+        'status': status
+    }
+    
+    def render():
+        # fetch one extra row to know whether there is a next page
+        per_page, after = page_args()
+        query, params = events_query(event_name, sex, grade, status, after=after, limit=per_page + 1)
+
+        # create dropdown list for filtering
+        db = get_db()
+        with phase('query'):
+            events = db.execute(query, params).fetchall()
+            distinct_events = db.execute("SELECT DISTINCT event FROM Events ORDER BY event_id").fetchall()
+        next_cursor = events[per_page - 1]['event_id'] if len(events) > per_page else None
+
+        with phase('render'):
+            return render_template('list_events.html',
+                    events=events[:per_page],
+                    distinct_events=distinct_events,
+                    sexes=['Boys', 'Girls'],
+                    grades=['A', 'B', 'C'],
+                    statuses=['Completed', 'Not yet started'],
+                    current_filters=current_filters,
+                    page=pagination(current_filters, next_cursor)
+            )
+
+    # a status change can move any event into a status filter, so only sex & grade scope the page
+    return cached_page({'sex': sex, 'grade': grade}, render)
 
 # show the results table
 @app.route('/results')
 @login_required
 def list_results():
-    db = get_db()
-    
     #filter function
     event_filter = request.args.get('event', '').strip()
     athlete_id = request.args.get('athlete', '').strip()
     sex_filter = request.args.get('sex', '')
     grade_filter = request.args.get('grade', '')
     status_filter = request.args.get('status', '')
+    current_filters = {
+        'event': event_filter,
+        'athlete': athlete_id,
+        'sex': sex_filter,
+        'grade': grade_filter,
+        'status': status_filter
+    }
     
-    # sql for showing all data
-    sql = """
-        SELECT 
-            r.result_id,
-            r.result,
-            r.status,
-            a.athlete_id, 
-            a.name, 
-            a.house, 
-            a.grade AS athlete_grade,
-            a.sex AS athlete_sex,
-            e.event_id, 
-            e.event, 
-            e.sex AS event_sex, 
-            e.grade AS event_grade,
-            e.status AS event_status
-        FROM results r
-        JOIN Athletes a ON a.athlete_id = r.athlete_id
-        JOIN Events e ON e.event_id = r.event_id
-        WHERE 1=1
-    """
-    params = []
-    
-    # add the condition in the filer function to the sql 
-    if event_filter:
-        sql += " AND e.event = ?"
-        params.append(event_filter)
-    if sex_filter:
-        sql += " AND a.sex = ?"
-        params.append(sex_filter)
-    if grade_filter:
-        sql += " AND a.grade = ?"
-        params.append(grade_filter)
-    if status_filter:
-        sql += " AND r.status = ?"
-        params.append(status_filter)
-
-    all_rows = db.execute(sql, tuple(params)).fetchall()
-    
-    # group data by event
-    grouped = {}
-    for row in all_rows:
-        key = (row['event_id'], row['event'], f"{row['event_sex']} {row['event_grade']}")
-        if key not in grouped:
-            grouped[key] = {'event_status': row['event_status'], 'result': []}
-        
-        is_time_based = 'meters' in row['event'].lower()
-        
-        grouped[key]['result'].append({
-            'result_id': row['result_id'],
-            'athlete_id': row['athlete_id'],
-            'name': row['name'],
-            'house': row['house'],
-            'result': row['result'],
-            'is_time_based': is_time_based,
-            'status': row['status'] if row['event_status'] == 'Completed' else 'Not yet started',
-        })
-
-    # sort results in each event
-    ranked_groups = {}
-    for key, results in grouped.items():
-        
-        def invalid_ranking(r):
-            return (r['result'] is None) or (r['status'] in ('Disqualified', 'Not yet started'))
-        
-        is_time_based = results['result'][0]['is_time_based'] if results['result'] else False
-        valid = [res for res in results['result'] if not invalid_ranking(res)]
-        invalid = [res for res in results['result'] if invalid_ranking(res)]
-        
-        if is_time_based:
-            sorted_results = sorted(valid, key=lambda r: r['result'])
-        else:
-            sorted_results = sorted(valid, key=lambda r: -r['result'])
-        
-        sorted_results.extend(invalid)
-        
-        ranked_results = []
-        current_rank = 1
-        for i, result in enumerate(sorted_results):
-            if invalid_ranking(result):
-                result['rank'] = None
-                ranked_results.append(result)
-                continue
-            if i > 0 and result['result'] == sorted_results[i-1]['result']:
-                result['rank'] = current_rank
+    def render():
+        db = get_db()
+
+        per_page, after = results_page_args()
+
+        # rank in memory (or inside sqlite) and group the rows by event
+        filters = {
+            'event': event_filter,
+            'sex': sex_filter,
+            'grade': grade_filter,
+            'status': status_filter,
+            'athlete_id': athlete_id
+        }
+        with phase('query'):
+            if app.config['RESULT_STORE']:
+                results.refresh(db)
+                rows, next_cursor = results.ranked_page(per_page, after=after, **filters)
             else:
-                current_rank = i + 1
-                result['rank'] = current_rank
-            ranked_results.append(result)
-        
-        ranked_groups[key] = ranked_results
-    
-    # filter by athlete_id
-    if athlete_id:
-        filtered_groups = {}
-        for key, results in ranked_groups.items():
-            filtered_results = [r for r in results if r['athlete_id'] == athlete_id]
-            if filtered_results:
-                filtered_groups[key] = filtered_results
-        ranked_groups = filtered_groups
-    
-    # create dropdown list for filtering
-    sorted_groups = sorted(ranked_groups.items(), key=lambda x: x[0][0])
-    events = db.execute("SELECT DISTINCT event FROM Events ORDER BY event_id").fetchall() 
-
-    return render_template('list_results.html',
-            grouped_results=sorted_groups,
-            events=events,
-            sexes=['Boys', 'Girls'],
-            grades=['A', 'B', 'C'],
-            statuses=['Completed', 'Not yet started', 'Disqualified'],
-            current_filters={
-                'event': event_filter,
-                'athlete': athlete_id,
-                'sex': sex_filter,
-                'grade': grade_filter,
-                'status': status_filter
-            }
-    )
+                rows, next_cursor = ranking.ranked_page(db, per_page, after=after, **filters)
+            # create dropdown list for filtering
+            events = db.execute("SELECT DISTINCT event FROM Events ORDER BY event_id").fetchall() 
+
+        with phase('transform'):
+            sorted_groups = ranking.group_by_event(rows)
+            # the events the page boundaries cut, part of their rows are on another page
+            cut_events = {cursor[0] for cursor in (after, next_cursor) if cursor}
+
+        with phase('render'):
+            return render_template('list_results.html',
+                    grouped_results=sorted_groups,
+                    events=events,
+                    sexes=['Boys', 'Girls'],
+                    grades=['A', 'B', 'C'],
+                    statuses=['Completed', 'Not yet started', 'Disqualified'],
+                    current_filters=current_filters,
+                    cut_events=cut_events,
+                    page=pagination(current_filters, results_cursor(next_cursor))
+            )
+
+    return cached_page({'event': event_filter, 'sex': sex_filter, 'grade': grade_filter}, render)
+
+# one athlete's results, ranks & personal bests, read from the per-athlete index
+@app.route('/athletes/<athlete_id>')
+@login_required
+def athlete_profile(athlete_id):
+    db = get_db()
+    with phase('query'):
+        athlete = db.execute(ATHLETE_SQL, (athlete_id,)).fetchone()
+        if athlete is None:
+            abort(404)
+        rows = scoring.athlete_results(db, athlete_id)
+        points = db.execute(ATHLETE_POINTS_SQL, (athlete_id,)).fetchone()
+    with phase('transform'):
+        bests = scoring.personal_bests(rows)
+    with phase('render'):
+        return render_template('athlete.html',
+                athlete=athlete,
+                results=rows,
+                bests=bests,
+                points=points['points'] if points else 0
+        )
+
+# the best mark of every event / sex / grade over all meets, read from the records table
+@app.route('/records')
+@login_required
+def list_records():
+    db = get_db()
+    with phase('query'):
+        rows = records.all_records(db)
+    with phase('render'):
+        return render_template('records.html', records=rows, meets=meets.archived(app.config['ARCHIVE_DIR']))
+
+# the results of an archived meet, its file attached read-only for this request
+@app.route('/meets/<name>')
+@login_required
+def archived_meet(name):
+    sex = request.args.get('sex', '')
+    grade = request.args.get('grade', '')
+    event = request.args.get('event', '').strip()
+    current_filters = {'sex': sex, 'grade': grade, 'event': event}
+    per_page, after = results_page_args()
+
+    db = get_db()
+    try:
+        with meets.attached(db, app.config['ARCHIVE_DIR'], name) as schema:
+            with phase('query'):
+                rows, next_cursor = ranking.ranked_page(
+                    db, per_page, after=after, event=event, sex=sex, grade=grade, schema=schema
+                )
+                rows = [dict(row) for row in rows]
+                events = db.execute(f"SELECT DISTINCT event FROM {schema}.Events ORDER BY event").fetchall()
+    except FileNotFoundError:
+        abort(404)
+
+    with phase('render'):
+        return render_template('meet.html',
+                meet=name,
+                grouped_results=ranking.group_by_event(rows),
+                events=events,
+                sexes=['Boys', 'Girls'],
+                grades=['A', 'B', 'C'],
+                current_filters=current_filters,
+                page=pagination(current_filters, results_cursor(next_cursor))
+        )
+
+# typeahead suggestions for the athlete & event search boxes
+@app.route('/search')
+@login_required
+def search_names():
+    text = request.args.get('q', '').strip()
+    kind = request.args.get('kind', 'athletes')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    db = get_db()
+    with phase('query'):
+        if kind == 'athletes':
+            suggestions = [
+                {
+                    'value': a['athlete_id'],
+                    'name': a['name'],
+                    'label': f"{a['name']} ({a['house']}, {a['sex']} {a['grade']})"
+                }
+                for a in search.athletes(db, text, limit)
+            ]
+        elif kind == 'events':
+            suggestions = [{'value': e['event'], 'label': e['event']} for e in search.events(db, text, limit)]
+        else:
+            abort(400)
+    return {'q': text, 'kind': kind, 'suggestions': suggestions}
+
+# house standings & top athletes, read straight from the points totals
+@app.route('/leaderboard')
+@login_required
+def leaderboard():
+    db = get_db()
+    with phase('query'):
+        houses = scoring.house_standings(db)
+        athletes = scoring.top_athletes(db)
+    with phase('render'):
+        return render_template('leaderboard.html',
+                houses=houses,
+                athletes=athletes,
+                points_per_place=app.config['POINTS_PER_PLACE']
+        )
+
+# server-sent events with the new standings of every event that changes
+@app.route('/results/stream')
+@login_required
+def results_stream():
+    subscription = live_updates.subscribe()
+
+    def messages():
+        try:
+            yield "retry: 3000\n\n"
+            while not subscription.dropped:
+                message = subscription.get(timeout=15)
+                if message is None:
+                    # keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: standings\ndata: {message}\n\n"
+        finally:
+            live_updates.unsubscribe(subscription)
+
+    response = app.response_class(messages(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# the list_results filters of an export request
+def export_filters(args):
+    return {
+        'event': args.get('event', '').strip(),
+        'sex': args.get('sex', ''),
+        'grade': args.get('grade', ''),
+        'status': args.get('status', ''),
+        'athlete_id': args.get('athlete', '').strip(),
+    }
+
+# stream the ranked results as csv or ndjson, with the same filters as list_results
+@app.route('/results/export')
+@login_required
+def export_results():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        abort(400)
+    to_lines, mimetype = exporter.FORMATS[fmt]
+
+    # rows go from the sqlite cursor straight into the response
+    rows = ranking.ranked_results(get_db(), **export_filters(request.args))
+    response = app.response_class(stream_with_context(to_lines(rows)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=results.{fmt}'
+    return response
+
+# fingerprinted static files, with a pre-compressed variant when the browser takes one
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    dist = os.path.join(app.static_folder, assets.DIST)
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(
+                dist, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0],
+                max_age=app.config['ASSET_MAX_AGE']
+            )
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=app.config['ASSET_MAX_AGE'])
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+# request, phase & query timings in the Prometheus text format
+@app.route('/metrics')
+@login_required
+@admin_required
+def metrics_endpoint():
+    if not app.config['METRICS_ENABLED']:
+        abort(404)
+    return app.response_class(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# every route's sql with its filters filled in, for checking the query plans
+# taken from the same constants & builders the routes run, so a changed statement is checked as it is
+def route_queries():
+    cursor = ('EV0001', 0, 1, 12.5, 1)
+    yield 'login', USER_SQL, ['admin']
+    yield 'login', REHASH_SQL, ['hash', 'admin']
+    yield 'add_result', ATHLETE_SQL, ['ATH001']
+    yield 'add_result', EVENT_SQL, ['EV0001']
+    yield 'add_result', INSERT_RESULT_SQL, ['ATH001', 'EV0001', 12.5, 'Completed']
+    yield 'add_result', records.HOLDS_RECORD_SQL, [1]
+    yield 'edit_result', RESULT_ROW_SQL, [1]
+    yield 'edit_result', UPDATE_RESULT_SQL, [1.0, 'Completed', 1]
+    yield 'delete_result', DELETE_RESULT_SQL, [1]
+    yield 'edit_event', UPDATE_EVENT_SQL, ['Completed', 'EV0001']
+
+    # what every write runs to move the points, ranks & records of its event
+    yield 'rescore', scoring.EVENT_POINTS_SQL, ['EV0001']
+    yield ('rescore', *ranking.ranked_results_query(first_event='EV0001', last_event='EV0001'))
+    yield 'rescore', scoring.DELETE_EVENT_POINTS_SQL, ['EV0001']
+    yield 'rescore', scoring.DELETE_EVENT_RANKS_SQL, ['EV0001']
+    key = ['100 meters', 'Boys', 'A']
+    yield 'rescore', records.EVENT_KEY_SQL, ['EV0001']
+    yield ('rescore', *records.best_query(where=records.BEST_WHERE, params=key))
+    yield ('rescore', *records.with_direction_query('record_baseline', records.BASELINE_WHERE, key))
+    yield 'rescore', records.DELETE_RECORD_SQL, key
+    yield 'rescore', TRIM_CHANGES_SQL, [app.config['CHANGE_LOG_SIZE']]
+
+    yield 'athlete_profile', ATHLETE_SQL, ['ATH001']
+    yield 'athlete_profile', scoring.ATHLETE_RESULTS_SQL, ['ATH001']
+    yield 'athlete_profile', ATHLETE_POINTS_SQL, ['ATH001']
+    # house standings read every house row, there are only a handful
+    yield 'leaderboard', scoring.TOP_ATHLETES_SQL, [10]
+
+    # each filter combination, the unfiltered listings are full scans by design
+    for athlete_id, house, sex, grade in itertools.product(['', 'ATH001'], ['', 'Red'], ['', 'Boys'], ['', 'A']):
+        if athlete_id or house or sex or grade:
+            yield ('list_athletes', *athletes_query(athlete_id, house, sex, grade))
+    yield ('list_athletes', *athletes_query(name='smi'))
+    yield ('list_athletes', *athletes_query(house='Red', name='smi'))
+    for event_name, sex, grade, status in itertools.product(['', 'meters'], ['', 'Boys'], ['', 'A'], ['', 'Completed']):
+        if event_name or sex or grade or status:
+            yield ('list_events', *events_query(event_name, sex, grade, status))
+    yield 'search_names', search.ATHLETES_SQL, [search.match_query('jo sm'), 10]
+    yield 'search_names', search.EVENTS_SQL, [search.match_query('jump'), 10]
+    for event, sex, grade, status, athlete_id in itertools.product(
+            ['', '100 meters'], ['', 'Boys'], ['', 'A'], ['', 'Completed'], ['', 'ATH001']):
+        if event or sex or grade or status or athlete_id:
+            yield ('list_results', *ranking.ranked_results_query(event, sex, grade, status, athlete_id))
+
+    # a results page ranks one window of events at a time, from the start or from a cursor
+    for event, sex, grade in itertools.product(['', '100 meters'], ['', 'Boys'], ['', 'A']):
+        yield ('list_results', *ranking.event_window_query('', '>', 50, event, sex, grade))
+        yield ('list_results', *ranking.event_window_query('EV0001', '>=', 50, event, sex, grade))
+    for event, sex, after in itertools.product(['', '100 meters'], ['', 'Boys'], [None, cursor]):
+        yield ('list_results', *ranking.ranked_results_query(
+            event, sex, first_event='EV0001', last_event='EV0050', after=after, limit=51
+        ))
+
+    # the result store catching up with the change log & reloading the changed events
+    yield 'list_results', result_store.CHANGES_RANGE_SQL, []
+    yield 'list_results', result_store.CHANGED_EVENTS_SQL, [0]
+    for query in result_store.load_queries(['EV0001', 'EV0002']):
+        yield ('list_results', *query)
+
+# the full table scans in the plan of one statement
+# scans of subqueries and constant rows are fine, scans of tables are not
+# a full text MATCH shows as a scan of its virtual table but reads the fts index
+def table_scans(db, sql, params):
+    plan = db.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [
+        row['detail'] for row in plan
+        if re.match(r"SCAN (?!\(|CONSTANT ROW)", row['detail'])
+        and not re.match(r"SCAN \w+ VIRTUAL TABLE INDEX \d+:M", row['detail'])
+    ]
+
+# fail when any route's sql falls back to scanning a whole table
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    db = get_db()
+    failed = 0
+    for route, sql, params in route_queries():
+        scans = table_scans(db, sql, params)
+        if scans:
+            failed += 1
+            print(f"{route}: {' '.join(sql.split())}")
+            for detail in scans:
+                print(f"    {detail}")
+    if failed:
+        print(f"{failed} queries scan a full table")
+        raise SystemExit(1)
+    print("all query plans use indexes")
+
+# recreate the database with generated sample data
+@app.cli.command('init-db')
+@click.option('--athletes', default=120, help="Number of athletes to generate.")
+@click.option('--seed', type=int, help="Seed for repeatable data.")
+@click.option('--events-per-athlete', default=2)
+@click.option('--heats', default=1, help="Copies of every event / sex / grade.")
+def init_db_command(athletes, seed, events_per_athlete, heats):
+    init_db(athletes, seed=seed, events_per_athlete=events_per_athlete, heats=heats)
+
+# generate the seed database a new DATABASE is copied from, the current database isn't touched
+@app.cli.command('build-seed')
+@click.option('--athletes', default=120, help="Number of athletes to generate.")
+@click.option('--seed', type=int, help="Seed for repeatable data.")
+@click.option('--events-per-athlete', default=2)
+@click.option('--heats', default=1, help="Copies of every event / sex / grade.")
+def build_seed_command(athletes, seed, events_per_athlete, heats):
+    target = app.config['SEED_DATABASE']
+    database = app.config['DATABASE']
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with tempfile.TemporaryDirectory() as folder:
+        app.config['DATABASE'] = os.path.join(folder, 'seed.db')
+        try:
+            with app.app_context():
+                init_db(athletes, seed=seed, events_per_athlete=events_per_athlete, heats=heats)
+                # one compact file, without the -wal next to it
+                get_db().execute("VACUUM INTO ?", (tmp,))
+        finally:
+            close_pools()
+            app.config['DATABASE'] = database
+    os.replace(tmp, target)
+    print(f"wrote {target}")
+
+# bulk import results from the command line
+@app.cli.command('import-results')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'ndjson']), help="Defaults to the file extension.")
+def import_results_command(path, fmt):
+    db = get_db()
+    with open(path, 'rb') as f:
+        inserted, failed, errors, event_ids = importer.import_results(
+            db, importer.read_rows(f, fmt or importer.guess_format(path)), get_event_types(),
+            before_commit=lambda ids: rescore(db, *ids)
+        )
+    for number, error in errors:
+        print(f"row {number}: {error}")
+    print(f"imported {inserted} results, {failed} rows rejected")
+
+# stream the ranked results to a file or stdout
+@app.cli.command('export-results')
+@click.option('--format', 'fmt', type=click.Choice(sorted(exporter.FORMATS)), default='csv')
+@click.option('--output', type=click.File('w'), default='-')
+@click.option('--event', default='')
+@click.option('--sex', default='')
+@click.option('--grade', default='')
+@click.option('--status', default='')
+@click.option('--athlete', default='')
+def export_results_command(fmt, output, event, sex, grade, status, athlete):
+    to_lines, _ = exporter.FORMATS[fmt]
+    rows = ranking.ranked_results(get_db(), event, sex, grade, status, athlete)
+    for line in to_lines(rows):
+        output.write(line)
+
+# write static html & json copies of the results for kiosks & mirrors
+# a second run only rewrites the events whose results changed
+@app.cli.command('publish-snapshot')
+@click.option('--output', type=click.Path(file_okay=False), default='snapshot')
+@click.option('--full', is_flag=True, help="Rewrite every page, not only the changed ones.")
+def publish_snapshot_command(output, full):
+    def render(template, **context):
+        return app.jinja_env.get_template(template).render(**context)
+    written, removed = publisher.publish(get_db(), output, render, app.static_folder, full=full)
+    print(f"wrote {len(written)} files, removed {len(removed)} to {output}")
+
+# archive the current meet under a name & start the next one
+# athletes, events & users stay, results go & every event is back to not yet started
+@app.cli.command('new-meet')
+@click.argument('archive_as')
+def new_meet_command(archive_as):
+    if not meets.valid_name(archive_as):
+        raise click.BadParameter("letters, digits, - and _ only", param_hint='ARCHIVE_AS')
+    db = get_db()
+    try:
+        target = meets.archive(db, app.config['ARCHIVE_DIR'], archive_as)
+    except FileExistsError:
+        raise click.BadParameter(f"a meet named {archive_as} is already archived", param_hint='ARCHIVE_AS')
+    records.close_meet(db, archive_as)
+    db.execute("DELETE FROM results")
+    db.execute("UPDATE Events SET status = 'Not yet started'")
+    scoring.rescore_all(db, app.config['POINTS_PER_PLACE'])
+    records.rebuild(db)
+    db.commit()
+    pages.clear()
+    results.clear()
+    print(f"archived the meet to {target}, the next one starts empty")
+
+# redo the records baseline from the archived meet files, after adding or removing one by hand
+@app.cli.command('rebuild-records')
+def rebuild_records_command():
+    db = get_db()
+    records.rebuild_baseline(db, app.config['ARCHIVE_DIR'])
+    db.commit()
+    print(f"{len(records.all_records(db))} records")
+
+# add or change how an event is measured & ranked
+@app.cli.command('add-event-type')
+@click.argument('event')
+@click.option('--kind', type=click.Choice([event_types.TIMED, event_types.MEASURED]), required=True)
+@click.option('--unit', help="Defaults to s for timed and m for measured events.")
+@click.option('--min-value', type=float)
+@click.option('--max-value', type=float)
+@click.option('--precision', default=2)
+def add_event_type_command(event, kind, unit, min_value, max_value, precision):
+    db = get_db()
+    timed = kind == event_types.TIMED
+    event_types.add(db, event_types.EventType(
+        event, kind, unit or ('s' if timed else 'm'), 1 if timed else -1, min_value, max_value, precision
+    ))
+    # results already entered for the event may rank the other way now
+    for (event_id,) in db.execute("SELECT event_id FROM Events WHERE event=?", (event,)).fetchall():
+        rescore(db, event_id)
+    db.commit()
+    print(f"saved event type {event}, restart the server to load it")
+
+# rebuild the points totals from every result
+@app.cli.command('rescore')
+def rescore_command():
+    db = get_db()
+    scoring.rescore_all(db, app.config['POINTS_PER_PLACE'])
+    db.commit()
+    print("points totals rebuilt")
+
+# fingerprint & pre-compress everything under static for long-lived caching
+@app.cli.command('build-assets')
+def build_assets_command():
+    manifest, written = assets.build(app.static_folder)
+    if assets.brotli is None:
+        print("brotli is not installed, only gzip variants were written")
+    print(f"fingerprinted {len(manifest)} files, wrote {len(written)} files to {os.path.join(app.static_folder, assets.DIST)}")
+
+# download the icon font into static/vendor so pages work without the CDN
+@app.cli.command('vendor-assets')
+def vendor_assets_command():
+    for name in assets.vendor(app.static_folder):
+        print(f"vendored {name}")
+    print("run `flask build-assets` to fingerprint them")
 
 # execution
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+# ASGI entry point, e.g. uvicorn asgi:application
+# the live standings stream & the exports are served on the event loop, so an idle
+# spectator or a slow download costs a coroutine instead of a thread
+# every other route runs unchanged as WSGI on a pool of threads
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import asgiref
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+import app as sports_app
+import async_db
+import exporter
+import ranking
+
+app = sports_app.app
+
+# asgiref runs every WSGI request on one shared thread, spread them over the default executor instead
+# asgiref has no option for that, so this rewraps the plain function under its sync_to_async
+# decorator (__wrapped__, set by functools.update_wrapper; asgiref 3.x)
+# a release that changes it gets the stock single thread & a warning, rather than a broken app
+wsgi_body = getattr(WsgiToAsgiInstance.__dict__.get('run_wsgi_app'), '__wrapped__', None)
+
+class ThreadedWsgiInstance(WsgiToAsgiInstance):
+    if wsgi_body is not None:
+        run_wsgi_app = sync_to_async(wsgi_body, thread_sensitive=False)
+
+class ThreadedWsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+if wsgi_body is None:
+    warnings.warn(f"asgiref {asgiref.__version__}: WSGI requests run on one thread", RuntimeWarning)
+    wsgi = WsgiToAsgi(app)
+else:
+    wsgi = ThreadedWsgi(app)
+
+database = None
+
+def get_database():
+    global database
+    if database is None or database.database != app.config['DATABASE']:
+        sports_app.ensure_db()
+        database = async_db.AsyncDatabase(
+            app.config['DATABASE'],
+            readers=app.config['ASYNC_DB_READERS'],
+            connections=app.config['ASYNC_DB_CONNECTIONS'],
+            timeout=app.config['DB_POOL_TIMEOUT'],
+            pragmas=sports_app.db_pragmas()
+        )
+    return database
+
+# the flask session of a request, read from its signed cookie
+def load_session(scope):
+    cookies = parse_cookie(b"; ".join(v for k, v in scope['headers'] if k == b'cookie').decode('latin-1'))
+    value = cookies.get(app.config['SESSION_COOKIE_NAME'])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if not value or serializer is None:
+        return {}
+    try:
+        return serializer.loads(value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+async def start_response(send, status, content_type, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode())] + [(k.encode(), v.encode()) for k, v in headers],
+    })
+
+async def send_body(send, text, more=True):
+    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': more})
+
+# same as login_required for the routes below
+async def redirect_to_login(scope, send):
+    await start_response(send, 302, 'text/html; charset=utf-8', [('location', scope.get('root_path', '') + '/login')])
+    await send_body(send, '', more=False)
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+# server-sent events, same messages as the WSGI /results/stream
+async def results_stream(scope, receive, send):
+    subscription = sports_app.live_updates.subscribe(loop=asyncio.get_running_loop())
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await start_response(send, 200, 'text/event-stream; charset=utf-8', [
+            ('cache-control', 'no-cache'),
+            ('x-accel-buffering', 'no'),
+        ])
+        await send_body(send, "retry: 3000\n\n")
+        while not subscription.dropped and not disconnected.done():
+            message = asyncio.ensure_future(subscription.get(timeout=15))
+            await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                message.cancel()
+                break
+            if message.result() is None:
+                # keep proxies from closing an idle connection
+                await send_body(send, ": keep-alive\n\n")
+            else:
+                await send_body(send, f"event: standings\ndata: {message.result()}\n\n")
+    finally:
+        sports_app.live_updates.unsubscribe(subscription)
+        disconnected.cancel()
+
+# the ranked results as csv or ndjson, same as the WSGI /results/export
+async def export_results(scope, receive, send):
+    args = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+    fmt = args.get('format', 'csv')
+    if fmt not in exporter.FORMATS:
+        await start_response(send, 400, 'text/plain; charset=utf-8')
+        await send_body(send, 'Bad Request', more=False)
+        return
+    to_lines, mimetype = exporter.FORMATS[fmt]
+    filters = sports_app.export_filters(args)
+
+    await start_response(send, 200, f'{mimetype}; charset=utf-8', [
+        ('content-disposition', f'attachment; filename=results.{fmt}'),
+    ])
+    lines = get_database().stream(lambda db: to_lines(ranking.ranked_results(db, **filters)))
+    try:
+        async for chunk in lines:
+            await send_body(send, ''.join(chunk))
+    finally:
+        await lines.aclose()
+    await send_body(send, '', more=False)
+
+ROUTES = {
+    '/results/stream': results_stream,
+    '/results/export': export_results,
+}
+
+async def lifespan(receive, send):
+    global database
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            asyncio.get_running_loop().set_default_executor(
+                ThreadPoolExecutor(app.config['ASGI_THREADS'], thread_name_prefix='wsgi')
+            )
+            # the database & templates are ready before the server takes its first request
+            await asyncio.get_running_loop().run_in_executor(None, sports_app.warm_up)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if database is not None:
+                await asyncio.get_running_loop().run_in_executor(None, database.close)
+                database = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    route = ROUTES.get(scope['path']) if scope['type'] == 'http' and scope['method'] == 'GET' else None
+    if route is None:
+        return await wsgi(scope, receive, send)
+    if 'username' not in load_session(scope):
+        return await redirect_to_login(scope, send)
+    await route(scope, receive, send)
@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import urllib.parse
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# fingerprinted copies go here, with the manifest mapping each logical name to its copy
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+# text files worth sending compressed
+COMPRESS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ttf', '.eot'}
+
+# icon font served from static/vendor once vendored, from the CDN until then
+FONT_AWESOME = 'vendor/fontawesome/css/all.min.css'
+CDN = {
+    FONT_AWESOME: 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css',
+}
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+# every file under static except the build output, as posix paths relative to static
+def source_files(static):
+    for root, dirs, files in os.walk(static):
+        rel_root = os.path.relpath(root, static)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d != DIST]
+        for name in files:
+            yield posixpath.normpath(posixpath.join(rel_root.replace(os.sep, '/'), name))
+
+def fingerprint(name, data):
+    base, ext = posixpath.splitext(name)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+# point the url()s of a stylesheet at the fingerprinted copies, relative to the stylesheet's own copy
+def rewrite_css(name, text, manifest):
+    folder = posixpath.dirname(name)
+
+    def replace(match):
+        quote, url = match.groups()
+        path, sep, suffix = re.match(r'^([^?#]*)(.?)(.*)$', url).groups()
+        if re.match(r'^([a-z]+:|/|#)', path):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(folder, path))
+        if target not in manifest:
+            return match.group(0)
+        # the stylesheet's own copy sits in the same folder under dist
+        hashed = posixpath.relpath(manifest[target], posixpath.join(DIST, folder))
+        return f"url({quote}{hashed}{sep}{suffix}{quote})"
+
+    return CSS_URL.sub(replace, text)
+
+def write_variants(path, data):
+    written = [path]
+    if posixpath.splitext(path)[1] in COMPRESS:
+        with open(path + '.gz', 'wb') as f:
+            # mtime 0 keeps the output identical between builds
+            with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=9, mtime=0) as gz:
+                gz.write(data)
+        written.append(path + '.gz')
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+            written.append(path + '.br')
+    return written
+
+# copy every static file to static/dist under a content-hashed name,
+# next to its gzip (and brotli, when installed) variants, then write the manifest
+def build(static):
+    dist = os.path.join(static, DIST)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    names = sorted(source_files(static))
+    # stylesheets last, their url()s need the names of everything else
+    names.sort(key=lambda n: n.endswith('.css'))
+
+    manifest = {}
+    written = []
+    for name in names:
+        with open(os.path.join(static, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            # the hash covers the rewritten urls, so a changed font changes the stylesheet too
+            data = rewrite_css(name, data.decode('utf-8'), manifest).encode('utf-8')
+        manifest[name] = f"{DIST}/{fingerprint(name, data)}"
+        path = os.path.join(static, manifest[name])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        written += write_variants(path, data)
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest, written
+
+def load_manifest(static):
+    try:
+        with open(os.path.join(static, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+# download a CDN stylesheet and every file it points at into static/vendor
+def vendor(static, name=FONT_AWESOME):
+    css_url = CDN[name]
+    css = fetch(css_url)
+    files = {name: css}
+    for _, url in CSS_URL.findall(css.decode('utf-8')):
+        path = url.split('?')[0].split('#')[0]
+        if re.match(r'^([a-z]+:|/)', path):
+            continue
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+        if target not in files:
+            files[target] = fetch(urllib.parse.urljoin(css_url, path))
+
+    for target, data in files.items():
+        path = os.path.join(static, *target.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return sorted(files)
@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import db_pool
+
+# sqlite reads for asyncio code, on a few reader threads with pooled connections
+# so the event loop never waits on the database
+# there are no writes here: those go through the app's write() & its group commit writer,
+# which also keeps the points, ranks & records up to date
+class AsyncDatabase:
+    def __init__(self, database, readers=4, connections=32, timeout=10.0, pragmas=()):
+        self.database = database
+        # more connections than threads, a long export holds its connection between batches
+        self.readers = db_pool.ConnectionPool(database, connections, timeout, pragmas)
+        self._read_threads = ThreadPoolExecutor(readers, thread_name_prefix='sqlite-reader')
+
+    async def _run(self, executor, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+    # the items of the iterator fn(db, *args) builds, in lists of up to batch items
+    # a reader thread is only taken while a batch is being fetched
+    async def stream(self, fn, *args, batch=500):
+        db = await self._run(self._read_threads, self.readers.acquire)
+        try:
+            items = await self._run(self._read_threads, lambda: iter(fn(db, *args)))
+            while True:
+                chunk = await self._run(self._read_threads, list, itertools.islice(items, batch))
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.readers.release(db)
+
+    def close(self):
+        self._read_threads.shutdown(wait=True)
+        self.readers.close()
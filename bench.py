@@ -0,0 +1,207 @@
+# benchmark every route against generated databases of increasing size
+# usage: python bench.py --sizes 1000 10000 100000 --output bench-results.json
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+import app as sports_app
+import event_types
+
+app = sports_app.app
+
+# (name, method, path, form data) for every route worth measuring
+def route_cases(db):
+    event = db.execute("SELECT event, sex, grade FROM Events ORDER BY event_id LIMIT 1").fetchone()
+    athlete = db.execute("SELECT athlete_id FROM results ORDER BY result_id LIMIT 1").fetchone()
+    return [
+        ('login', 'POST', '/login', {'username': 'admin', 'password': 'adminpass'}),
+        ('list_results', 'GET', '/results', None),
+        ('list_results?event', 'GET', '/results?' + urllib.parse.urlencode({'event': event[0], 'sex': event[1]}), None),
+        ('list_results?athlete', 'GET', '/results?athlete=' + athlete[0], None),
+        ('list_athletes', 'GET', '/athletes', None),
+        ('list_athletes?house', 'GET', '/athletes?house=Red&grade=A', None),
+        ('list_events', 'GET', '/events', None),
+        ('list_events?status', 'GET', '/events?status=Completed', None),
+    ]
+
+# a result inside the event type's valid range, so add_result accepts it
+def valid_result(event_type):
+    if event_type is None or (event_type.min_value is None and event_type.max_value is None):
+        return 12.5
+    if event_type.min_value is None or event_type.max_value is None:
+        return event_type.min_value if event_type.max_value is None else event_type.max_value
+    return round((event_type.min_value + event_type.max_value) / 2, event_type.precision)
+
+# athlete, event & valid result for pairs that can still take a result, for add_result
+def free_entries(db, count):
+    types = event_types.load(db)
+    rows = db.execute("""
+        SELECT a.athlete_id, e.event_id, e.event FROM Events e
+        JOIN Athletes a ON a.sex = e.sex AND a.grade = e.grade
+        WHERE e.status = 'Completed'
+          AND NOT EXISTS (SELECT 1 FROM results r WHERE r.athlete_id = a.athlete_id AND r.event_id = e.event_id)
+        LIMIT ?
+    """, (count,)).fetchall()
+    return [(athlete_id, event_id, valid_result(types.get(event))) for athlete_id, event_id, event in rows]
+
+def percentile(latencies, p):
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method='inclusive')[p - 1]
+
+def summarize(size, route, mode, latencies, elapsed, peak_bytes=None):
+    return {
+        'size': size,
+        'route': route,
+        'mode': mode,
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'peak_memory_kb': None if peak_bytes is None else round(peak_bytes / 1024, 1),
+    }
+
+# time requests through the flask test client, one at a time
+def bench_test_client(size, cases, entries, requests, cached):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'adminpass'})
+    # add_result posts a new athlete & event pair every time
+    cases = cases + [('add_result', 'POST', '/add', None)]
+    report = []
+    for name, method, path, data in cases:
+        def call():
+            if name == 'add_result':
+                ath_id, ev_id, result = entries.pop()
+                form = {'athlete_id': ath_id, 'event_id': ev_id, 'result': str(result), 'status': 'Completed'}
+            else:
+                form = data
+            if not cached:
+                sports_app.pages.clear()
+            response = client.open(path, method=method, data=form)
+            if name == 'add_result':
+                # a rejected result re-renders the form with a 200, only the redirect means it was added
+                assert response.status_code == 302 and response.location.endswith('/results'), \
+                    (path, form, response.status_code)
+            else:
+                assert response.status_code < 400, (path, response.status_code)
+
+        count = min(requests, len(entries)) if name == 'add_result' else requests
+        if count == 0:
+            continue
+        call()  # warm up
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(count - 1):
+            t = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - started
+
+        # peak memory of a single request, measured apart from the timings
+        peak = None
+        if name != 'add_result' or entries:
+            tracemalloc.start()
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        report.append(summarize(size, name, 'test_client', latencies or [elapsed], elapsed, peak))
+        print(f"{size:>9} {name:<22} p50 {report[-1]['p50_ms']:>9.2f}ms  p99 {report[-1]['p99_ms']:>9.2f}ms")
+    return report
+
+# time requests against a real threaded WSGI server with concurrent clients
+def bench_server(size, cases, requests, concurrency, cached):
+    # keep the request log from drowning the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    report = []
+    try:
+        def opener():
+            jar = http.cookiejar.CookieJar()
+            o = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+            o.open(base + '/login', urllib.parse.urlencode({'username': 'admin', 'password': 'adminpass'}).encode()).read()
+            return o
+        openers = [opener() for _ in range(concurrency)]
+
+        for name, method, path, data in cases:
+            if method != 'GET':
+                continue
+            def worker(o, n):
+                latencies = []
+                for _ in range(n):
+                    if not cached:
+                        sports_app.pages.clear()
+                    t = time.perf_counter()
+                    o.open(base + path).read()
+                    latencies.append(time.perf_counter() - t)
+                return latencies
+            per_client = max(1, requests // concurrency)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                futures = [pool.submit(worker, o, per_client) for o in openers]
+                latencies = [l for f in futures for l in f.result()]
+            elapsed = time.perf_counter() - started
+            report.append(summarize(size, name, f'server x{concurrency}', latencies, elapsed))
+            print(f"{size:>9} {name:<22} p50 {report[-1]['p50_ms']:>9.2f}ms  {report[-1]['throughput_rps']:>8.1f} req/s (x{concurrency})")
+    finally:
+        server.shutdown()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sports day routes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="Athletes per database.")
+    parser.add_argument('--events-per-athlete', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=50, help="Requests per route.")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cached', action='store_true', help="Keep the page cache between requests.")
+    parser.add_argument('--server', action='store_true', help="Also drive a real WSGI server.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', default='bench-results.json')
+    args = parser.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            app.config['DATABASE'] = os.path.join(tmp, f'bench-{size}.db')
+            with app.app_context():
+                init_db_started = time.perf_counter()
+                sports_app.init_db(size, seed=args.seed, events_per_athlete=args.events_per_athlete)
+                print(f"built {size} athletes in {time.perf_counter() - init_db_started:.1f}s")
+                db = sports_app.get_db()
+                cases = route_cases(db)
+                entries = free_entries(db, args.requests)
+            sports_app.pages.clear()
+
+            report += bench_test_client(size, cases, entries, args.requests, args.cached)
+            if args.server:
+                report += bench_server(size, cases, args.requests, args.concurrency, args.cached)
+            sports_app.get_pool().close()
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cached': args.cached,
+            'results': report,
+        }, f, indent=2)
+    print(f"wrote {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# benchmark a cold start: importing the app & serving its first request, each run in a fresh interpreter
+# usage: python bench_startup.py --runs 5 --max-import-ms 300 --max-first-request-ms 300
+# exits 1 when the median of a measurement is over its limit or a heavy module got imported, so it can guard CI
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# modules only seeding needs, importing the app mustn't pull them in
+HEAVY_MODULES = ['faker']
+
+# runs in the child: time the import, then one logged in page through the test client
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app as sports_app
+imported = time.perf_counter()
+heavy = [m for m in %r if m in sys.modules]
+client = sports_app.app.test_client()
+with client.session_transaction() as session:
+    session['username'] = 'admin'
+    session['role'] = 'admin'
+response = client.get(%r)
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (done - imported) * 1000,
+    'status': response.status_code,
+    'heavy_modules': heavy,
+}))
+"""
+
+def run_child(path, env):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD % (HEAVY_MODULES, path)],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# one case: a fresh interpreter per run, against an existing database or a copy of the seed
+def bench_case(name, runs, path, env, before_run=None):
+    samples = []
+    for _ in range(runs):
+        if before_run:
+            before_run()
+        samples.append(run_child(path, env))
+    report = {
+        'case': name,
+        'runs': runs,
+        'import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'first_request_ms': round(statistics.median(s['first_request_ms'] for s in samples), 1),
+        'status': sorted({s['status'] for s in samples}),
+        'heavy_modules': sorted({m for s in samples for m in s['heavy_modules']}),
+    }
+    print(f"{name:<12} import {report['import_ms']:>8.1f}ms  first request {report['first_request_ms']:>8.1f}ms")
+    return report
+
+def remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sports day app's cold start.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--athletes', type=int, default=1000, help="Athletes in the seed database.")
+    parser.add_argument('--path', default='/results', help="The first page requested.")
+    parser.add_argument('--max-import-ms', type=float, help="Fail when the median import takes longer.")
+    parser.add_argument('--max-first-request-ms', type=float, help="Fail when the median first request takes longer.")
+    parser.add_argument('--output', help="Also write the report as json.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed = os.path.join(tmp, 'seed.db')
+        database = os.path.join(tmp, 'sports_day.db')
+        env = {
+            **os.environ,
+            'DATABASE': database,
+            'SEED_DATABASE': seed,
+            'TEMPLATE_CACHE_DIR': os.path.join(tmp, 'jinja-cache'),
+        }
+        subprocess.run(
+            [sys.executable, '-m', 'flask', '--app', 'app', 'build-seed', '--athletes', str(args.athletes), '--seed', '1'],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True
+        )
+
+        # a new database copied from the seed, then the same database opened again
+        report = [
+            bench_case('from seed', args.runs, args.path, env, before_run=lambda: remove(database, database + '-wal', database + '-shm')),
+            bench_case('existing', args.runs, args.path, env),
+        ]
+
+    failures = []
+    for case in report:
+        if case['status'] != [200]:
+            failures.append(f"{case['case']}: {args.path} answered {case['status']}")
+        if case['heavy_modules']:
+            failures.append(f"{case['case']}: importing the app imported {', '.join(case['heavy_modules'])}")
+        if args.max_import_ms is not None and case['import_ms'] > args.max_import_ms:
+            failures.append(f"{case['case']}: import took {case['import_ms']}ms, over {args.max_import_ms}ms")
+        if args.max_first_request_ms is not None and case['first_request_ms'] > args.max_first_request_ms:
+            failures.append(f"{case['case']}: first request took {case['first_request_ms']}ms, over {args.max_first_request_ms}ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': report}, f, indent=2)
+        print(f"wrote {args.output}")
+    for failure in failures:
+        print(failure)
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+document.addEventListener('DOMContentLoaded', function() {
+  const main = document.querySelector('[data-live-url]');
+  if (!main || !window.EventSource) {
+    return;
+  }
+  // filtered pages, and events cut by the page boundaries, only update the rows they already show
+  const pageInsert = main.dataset.liveInsert === 'true';
+  const source = new EventSource(main.dataset.liveUrl);
+
+  const badges = {
+    'Completed': 'status-completed',
+    'Not yet started': 'status-notyet',
+    'Disqualified': 'status-disq'
+  };
+
+  function setRank(cell, rank) {
+    cell.textContent = rank === null ? '-' : rank;
+  }
+
+  function setResult(cell, result) {
+    cell.textContent = '';
+    if (result === null) {
+      const dash = document.createElement('span');
+      dash.className = 'no-result';
+      dash.textContent = '—';
+      cell.appendChild(dash);
+    } else {
+      cell.textContent = result.toFixed(2);
+    }
+  }
+
+  function setStatus(cell, status) {
+    const badge = document.createElement('span');
+    badge.className = 'status-badge ' + (badges[status] || 'status-unknown');
+    badge.textContent = status;
+    cell.textContent = '';
+    cell.appendChild(badge);
+  }
+
+  function buildRow(row, columns) {
+    const tr = document.createElement('tr');
+    tr.dataset.resultId = row.result_id;
+    const classes = ['rank-cell', '', '', '', 'result-cell', 'status-cell'];
+    for (let i = 0; i < columns; i++) {
+      const td = document.createElement('td');
+      if (classes[i]) {
+        td.className = classes[i];
+      }
+      tr.appendChild(td);
+    }
+    tr.children[1].textContent = row.athlete_id;
+    tr.children[2].textContent = row.name;
+    tr.children[3].textContent = row.house;
+    return tr;
+  }
+
+  // patch one event's table with its new standings
+  source.addEventListener('standings', function(e) {
+    const standings = JSON.parse(e.data);
+    const card = main.querySelector('.results-card[data-event-id="' + CSS.escape(standings.event_id) + '"]');
+    if (!card) {
+      return;
+    }
+    const canInsert = pageInsert && card.dataset.liveInsert === 'true';
+    const tbody = card.querySelector('tbody');
+    const columns = card.querySelectorAll('thead th').length;
+    const shown = new Map();
+    tbody.querySelectorAll('tr[data-result-id]').forEach(function(tr) {
+      shown.set(tr.dataset.resultId, tr);
+    });
+
+    standings.rows.forEach(function(row) {
+      const id = String(row.result_id);
+      let tr = shown.get(id);
+      if (!tr) {
+        if (!canInsert) {
+          return;
+        }
+        tr = buildRow(row, columns);
+      }
+      shown.delete(id);
+      setRank(tr.querySelector('.rank-cell'), row.rank);
+      setResult(tr.querySelector('.result-cell'), row.result);
+      setStatus(tr.querySelector('.status-cell'), row.status);
+      // appending in standings order moves every row into place
+      tbody.appendChild(tr);
+    });
+
+    // whatever is left was deleted
+    shown.forEach(function(tr) {
+      tr.remove();
+    });
+  });
+});
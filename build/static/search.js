@@ -0,0 +1,52 @@
+document.addEventListener('DOMContentLoaded', function() {
+  // typeahead for inputs marked data-search="athletes|events", filling their datalist
+  document.querySelectorAll('input[data-search]').forEach(function(input) {
+    const list = document.getElementById(input.getAttribute('list'));
+    const field = input.dataset.searchField || 'value';
+    let timer = null;
+    let pending = null;
+    let last = input.value.trim();
+
+    function show(suggestions) {
+      list.textContent = '';
+      suggestions.forEach(function(s) {
+        const option = document.createElement('option');
+        option.value = s[field];
+        if (s.label !== s[field]) {
+          option.label = s.label;
+        }
+        list.appendChild(option);
+      });
+    }
+
+    function lookup() {
+      const q = input.value.trim();
+      if (q === last) {
+        return;
+      }
+      last = q;
+      // only the answer to the latest keystroke is shown
+      if (pending) {
+        pending.abort();
+      }
+      if (!q) {
+        return;
+      }
+      pending = new AbortController();
+      const url = input.dataset.searchUrl + '?' + new URLSearchParams({kind: input.dataset.search, q: q});
+      fetch(url, {signal: pending.signal, headers: {'Accept': 'application/json'}})
+        .then(function(response) { return response.ok ? response.json() : null; })
+        .then(function(data) {
+          if (data && data.q === input.value.trim()) {
+            show(data.suggestions);
+          }
+        })
+        .catch(function() {});
+    }
+
+    input.addEventListener('input', function() {
+      clearTimeout(timer);
+      timer = setTimeout(lookup, 120);
+    });
+  });
+});
@@ -0,0 +1,81 @@
+import os
+import queue
+import urllib.parse
+import sqlite3
+import threading
+
+# a bounded pool of sqlite connections shared by the request threads
+# every connection runs its PRAGMA setup once, when it is opened
+class ConnectionPool:
+    def __init__(self, database, size=8, timeout=10.0, pragmas=(), factory=sqlite3.Connection, readonly=False):
+        self.database = database
+        self.factory = factory
+        self.readonly = readonly
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = list(pragmas)
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.readonly:
+            # sqlite itself refuses any write on these
+            target = f"file:{urllib.parse.quote(os.path.abspath(self.database))}?mode=ro"
+        else:
+            target = self.database
+        # uri filenames on every connection, so ATTACH can open an archived meet with mode=ro
+        db = sqlite3.connect(target, timeout=self.timeout, check_same_thread=False, factory=self.factory, uri=True)
+        db.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            db.execute(f"PRAGMA {name} = {value}")
+        return db
+
+    # borrow a connection, opening a new one while the pool is below its size
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # every connection is busy, wait for one to come back
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("no database connection available") from None
+
+    # hand a connection back, dropping anything left uncommitted
+    def release(self, db):
+        try:
+            if db.in_transaction:
+                db.rollback()
+        except sqlite3.Error:
+            # a broken connection is closed instead of reused
+            db.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(db)
+
+    # close every idle connection
+    def close(self):
+        while True:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            db.close()
+            with self._lock:
+                self._opened -= 1
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+# how an event is measured & ranked, one row of event_types per event name
+# direction 1 ranks the lowest result first (times), -1 the highest (distances & heights)
+# min_value / max_value bound a valid result, precision is the decimals a result keeps
+EventType = namedtuple('EventType', ['event', 'kind', 'unit', 'direction', 'min_value', 'max_value', 'precision'])
+
+TIMED = 'timed'
+MEASURED = 'measured'
+
+DEFAULT_TYPES = [
+    EventType('60 meters', TIMED, 's', 1, 6.0, 20.0, 2),
+    EventType('100 meters', TIMED, 's', 1, 9.0, 30.0, 2),
+    EventType('200 meters', TIMED, 's', 1, 19.0, 60.0, 2),
+    EventType('400 meters', TIMED, 's', 1, 43.0, 150.0, 2),
+    EventType('800 meters', TIMED, 's', 1, 100.0, 400.0, 2),
+    EventType('1500 meters', TIMED, 's', 1, 200.0, 700.0, 2),
+    EventType('100 meters hurdles', TIMED, 's', 1, 12.0, 40.0, 2),
+    EventType('110 meters hurdles', TIMED, 's', 1, 12.5, 40.0, 2),
+    EventType('4x100 meters relay', TIMED, 's', 1, 36.0, 120.0, 2),
+    EventType('4x400 meters relay', TIMED, 's', 1, 170.0, 500.0, 2),
+    EventType('High Jump', MEASURED, 'm', -1, 0.5, 2.5, 2),
+    EventType('Long Jump', MEASURED, 'm', -1, 1.0, 9.0, 2),
+    EventType('Triple Jump', MEASURED, 'm', -1, 3.0, 18.5, 2),
+    EventType('Shot Put', MEASURED, 'm', -1, 1.0, 23.0, 2),
+    EventType('Javelin', MEASURED, 'm', -1, 3.0, 100.0, 2),
+    EventType('Softball', MEASURED, 'm', -1, 3.0, 100.0, 2),
+]
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS event_types (
+        event TEXT PRIMARY KEY,
+        kind TEXT NOT NULL CHECK(kind IN('timed','measured')),
+        unit TEXT NOT NULL,
+        direction INTEGER NOT NULL CHECK(direction IN(1,-1)),
+        min_value REAL,
+        max_value REAL,
+        precision INTEGER NOT NULL DEFAULT 2
+    );
+"""
+
+def sql_value(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+# an event's ranking direction in sql: its type's, or for an event without a type the rule
+# used before event types, '... meters' are times & everything else a distance or height (as migration 3)
+def direction_sql(event='e.event', types='t'):
+    return f"COALESCE({types}.direction, CASE WHEN {event} LIKE '%meters%' THEN 1 ELSE -1 END)"
+
+# the table & its default rows as a sql script, for the schema migration
+def seed_sql(types=DEFAULT_TYPES):
+    rows = ",\n        ".join("(" + ", ".join(sql_value(v) for v in t) + ")" for t in types)
+    return f"{SCHEMA}\n    INSERT OR IGNORE INTO event_types VALUES\n        {rows};\n"
+
+# every event type by event name, read once and kept in memory
+def load(db):
+    return {
+        row[0]: EventType(*row)
+        for row in db.execute("SELECT event, kind, unit, direction, min_value, max_value, precision FROM event_types")
+    }
+
+def add(db, event_type):
+    db.execute("INSERT OR REPLACE INTO event_types VALUES (?,?,?,?,?,?,?)", event_type)
+
+# a result rounded to the decimals its event type keeps, as it's stored
+def round_result(event_type, result):
+    if event_type is None:
+        return result
+    return round(result, event_type.precision)
+
+# an error message for a result outside its event's valid range, or None
+def check_result(event_type, result):
+    if event_type is None:
+        return None
+    if event_type.min_value is not None and result < event_type.min_value:
+        return f"{event_type.event} results must be at least {event_type.min_value:g} {event_type.unit}"
+    if event_type.max_value is not None and result > event_type.max_value:
+        return f"{event_type.event} results must be at most {event_type.max_value:g} {event_type.unit}"
+    return None
@@ -0,0 +1,30 @@
+import csv
+import io
+import json
+
+# columns of an exported result row
+FIELDS = ['event_id', 'event', 'event_sex', 'event_grade', 'rank', 'athlete_id', 'name', 'house', 'result', 'status', 'result_id']
+
+# turn ranked rows into csv text, one line at a time
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow([row[field] for field in FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # the header alone when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# turn ranked rows into newline-delimited json
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps({field: row[field] for field in FIELDS}) + "\n"
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
@@ -1,87 +1,114 @@
-from faker import Faker
-from random import *
+from random import Random
 
-# generate n random names
-def fake_name(n):
+import event_types
+
+HOUSES = ['Red', 'Blue', 'Green', 'Yellow']
+SEXES = ['Boys', 'Girls']
+GRADES = ['A', 'B', 'C']
+EVENTS = ['60 meters', '100 meters', '200 meters', '400 meters', '800 meters', '1500 meters', 'High Jump', 'Long Jump', 'Shot Put', 'Javelin', 'Softball']
+
+EXCLUDED_COMBINATIONS = {
+    ('60 meters', 'Boys', 'A'), ('60 meters', 'Boys', 'B'),
+    ('60 meters', 'Boys', 'C'), ('60 meters', 'Girls', 'A'),
+    ('Javelin', 'Boys', 'C'), ('Javelin', 'Girls', 'B'),
+    ('Javelin', 'Girls', 'C'), ('Softball', 'Boys', 'A'),
+    ('Softball', 'Boys', 'B'), ('Softball', 'Girls', 'A')
+}
+
+# default status mixes, they only use values allowed by the schema
+EVENT_STATUSES = {'Completed': 0.5, 'Not yet started': 0.5}
+RESULT_STATUSES = {'Completed': 0.5, 'Disqualified': 0.5}
+
+# a pool of first & last names, combined to name any number of athletes quickly
+# faker is slow to import, only seeding a database pays for it
+def name_pool(seed, size=500):
+    from faker import Faker
     fake = Faker()
-    return ['']+[fake.name() for _ in range(n)]
+    fake.seed_instance(seed)
+    first = [fake.first_name() for _ in range(size)]
+    last = [fake.last_name() for _ in range(size)]
+    return first, last
+
+# generate n random names
+def fake_name(rng, pool, n):
+    first, last = pool
+    return [f"{f} {l}" for f, l in zip(rng.choices(first, k=n), rng.choices(last, k=n))]
+
+# generate information of athletes start+1 .. start+n
+def sample_athlete(rng, pool, start, n, width=3):
+    names = fake_name(rng, pool, n)
+    houses = rng.choices(HOUSES, k=n)
+    sexes = rng.choices(SEXES, k=n)
+    grades = rng.choices(GRADES, k=n)
+    return [
+        (f"ATH{start + i + 1:0{width}d}", names[i], houses[i], sexes[i], grades[i])
+        for i in range(n)
+    ]
+
+# event types of the sample events, by name
+DEFAULT_TYPES = {t.event: t for t in event_types.DEFAULT_TYPES}
+
+# results are drawn from the valid range of the event type
+def result_range(event_type):
+    return event_type.min_value, event_type.max_value, event_type.precision
+
+# generate sample events, heats copies of every event / sex / grade
+def sample_event(rng, heats=1, statuses=EVENT_STATUSES):
+    combinations = [
+        (event, sex, grade)
+        for event in EVENTS for sex in SEXES for grade in GRADES
+        if (event, sex, grade) not in EXCLUDED_COMBINATIONS
+    ] * heats
+    chosen = rng.choices(list(statuses), weights=list(statuses.values()), k=len(combinations))
+    width = max(4, len(str(len(combinations))))
+    return [
+        (f"EV{idx:0{width}d}", event, sex, grade, status)
+        for idx, ((event, sex, grade), status) in enumerate(zip(combinations, chosen), start=1)
+    ]
+
+# index events by (sex, grade) with everything needed to make a result
+def index_events(events, types=DEFAULT_TYPES):
+    by_category = {}
+    for eid, evname, esex, egrade, status in events:
+        by_category.setdefault((esex, egrade), []).append((eid, status, result_range(types[evname])))
+    return by_category
+
+# generate results, each athlete takes part in events_per_athlete matching events
+def sample_result(rng, athletes, by_category, events_per_athlete=2, statuses=RESULT_STATUSES):
+    # statuses & result fractions for the whole batch in two calls
+    k = len(athletes) * events_per_athlete
+    athlete_statuses = iter(rng.choices(list(statuses), weights=list(statuses.values()), k=k))
+    fractions = iter([rng.random() for _ in range(k)])
+    results = []
+    for aid, _, _, asex, agrad in athletes:
+        # ensure the sex and grade of athlete match the event
+        category = by_category.get((asex, agrad), [])
+        for eid, event_status, (low, high, precision) in rng.sample(category, min(events_per_athlete, len(category))):
+            athlete_status = next(athlete_statuses)
+            fraction = next(fractions)
+            # generate realistic result
+            if event_status == 'Not yet started':
+                results.append((aid, eid, None, 'Not yet started'))
+            else:
+                results.append((aid, eid, round(low + (high - low) * fraction, precision), athlete_status))
+    return results
 
-# generate information of n athletes
-def sample_athlete(n):
-    names = fake_name(n)
-    houses = ['Red', 'Blue', 'Green', 'Yellow']
-    sexes = ['Boys', 'Girls']
-    grades = ['A', 'B', 'C']
-    sample_athletes = []
-    
-    for i in range(1, n+1):
-        aid = f"ATH{i:03d}"
-        name = names[i]
-        house = houses[randint(0, 3)]
-        sex = sexes[randint(0, 1)]
-        grade = grades[randint(0, 2)]
-        sample_athletes.append((aid, name, house, sex, grade))
-    
-    return sample_athletes
-    
-# generate sample event
-def sample_event():
-    events = ['60 meters', '100 meters', '200 meters', '400 meters', '800 meters', '1500 meters', 'High Jump', 'Long Jump', 'Shot Put', 'Javelin', 'Softball']
-    sexes = ['Boys', 'Girls']
-    grades = ['A', 'B', 'C']
-    statuses = ['Completed', 'Not yet start']
+# write sample data straight into the database in chunks of athletes
+# the same seed always produces the same data
+def write_sample(db, n, seed=None, events_per_athlete=2, heats=1, chunk_size=10000,
+                 event_statuses=EVENT_STATUSES, result_statuses=RESULT_STATUSES):
+    rng = Random(seed)
+    sample_events = sample_event(rng, heats, event_statuses)
+    db.executemany("INSERT INTO Events VALUES (?,?,?,?,?)", sample_events)
 
-    excluded_combinations = {
-        ('60 meters', 'Boys', 'A'), ('60 meters', 'Boys', 'B'), 
-        ('60 meters', 'Boys', 'C'), ('60 meters', 'Girls', 'A'), 
-        ('Javelin', 'Boys', 'C'), ('Javelin', 'Girls', 'B'), 
-        ('Javelin', 'Girls', 'C'), ('Softball', 'Boys', 'A'), 
-        ('Softball', 'Boys', 'B'), ('Softball', 'Girls', 'A')
-    }
-    
-    event_list = []
-    idx = 1
-    
-    for event in events:
-        for sex in sexes:
-            for grade in grades:
-                if (event, sex, grade) not in excluded_combinations:
-                    event_list.append((f"EV{idx:04d}", event, sex, grade, choice(statuses)))
-                    idx += 1
-    
-    return event_list
-  
-# generate and return all sample data  
-def sample(n):
-    sample_results = []
-    sample_athletes = sample_athlete(n)
-    sample_events = sample_event()
-    athlete_statuses = ['Completed', 'Disqualification']
-    for aid, _, _, asex, agrad in sample_athletes:
-        # assume each athlete participates in 2 events
-        count = 0
-        shuffle(sample_events)
-        
-        for eid, evname, esex, egrade, status in sample_events:
-            # ensure the sex and grade of athlete match the event
-            if esex == asex and egrade == agrad:
-                # generate realistic result
-                athlete_status = choice(athlete_statuses)
-                if status == 'Not yet start':
-                    val = None
-                    athlete_status = 'Not yet start'
-                elif 'meters' in evname.lower() and int(evname.split()[0]) >= 800:
-                    val = round(uniform(200, 600), 2)
-                elif 'meters' in evname.lower():
-                    val = round(uniform(10, 25), 2)
-                elif 'jump' in evname.lower() or 'put' in evname.lower() or 'javelin' in evname.lower():
-                    val = round(uniform(1.0, 15.0), 2)
-                else:
-                    val = round(uniform(10, 100), 2)
-                
-                sample_results.append((aid, eid, val, athlete_status))
-                count += 1
-                if count == 2:
-                    break
-    
-    return sample_athletes, sorted(sample_events, key=lambda x: int(x[0][2:6])), sample_results
+    by_category = index_events(sample_events)
+    pool = name_pool(rng.getrandbits(32))
+    width = max(3, len(str(n)))
+    for start in range(0, n, chunk_size):
+        athletes = sample_athlete(rng, pool, start, min(chunk_size, n - start), width)
+        db.executemany("INSERT INTO Athletes VALUES (?,?,?,?,?)", athletes)
+        db.executemany(
+            "INSERT INTO results(athlete_id,event_id,result,status) VALUES (?,?,?,?)",
+            sample_result(rng, athletes, by_category, events_per_athlete, result_statuses)
+        )
+    db.commit()
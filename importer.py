@@ -0,0 +1,193 @@
+import csv
+import io
+import json
+
+import event_types
+
+STATUSES = ('Completed', 'Not yet started', 'Disqualified')
+BATCH_SIZE = 1000
+MAX_ERRORS = 200
+
+# stands in for a row that couldn't be read, import_results reports it like any other bad row
+class UnreadableRow:
+    def __init__(self, error):
+        self.error = error
+
+# the most characters one item of a json array may take, a result row is well under a kilobyte
+MAX_JSON_ITEM = 1024 * 1024
+
+# where the array item at the start of text ends: the index of the ',' or ']' after it, or -1 if it runs on
+# only brackets & strings are followed, enough to skip over an item that doesn't parse
+def item_end(text):
+    depth = 0
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '[{':
+            depth += 1
+        elif ch in ']}':
+            depth -= 1
+            if depth < 0:
+                return i
+        elif ch == ',' and depth == 0:
+            return i
+    return -1
+
+# stream the items of a json array without loading the whole file
+# an item that doesn't parse is one bad row, the items after it are still read
+def iter_json_array(text, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buffer = text.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("JSON file must hold an array of results")
+    buffer = buffer[1:]
+    number = 1
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError as e:
+            end = item_end(buffer)
+            if end > 0:
+                # the whole item is in the buffer and still doesn't parse
+                yield UnreadableRow(f"Invalid JSON: {e.msg}")
+                buffer = buffer[end:]
+                number += 1
+                continue
+            if len(buffer) > MAX_JSON_ITEM:
+                raise ValueError(f"JSON item {number} is over {MAX_JSON_ITEM} characters long") from None
+            # the item runs past the buffer, read more
+            more = text.read(chunk_size)
+            if not more:
+                raise ValueError("JSON array is not closed") from None
+            buffer += more
+            continue
+        yield item
+        buffer = buffer[end:]
+        number += 1
+
+# stream dict rows out of an uploaded csv, json array or json lines file
+def read_rows(stream, fmt):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        yield from csv.DictReader(text)
+    elif fmt == 'ndjson':
+        for line in text:
+            if line.strip():
+                # one broken line is one bad row, the lines after it are still read
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield UnreadableRow(f"Invalid JSON: {e.msg}")
+    else:
+        yield from iter_json_array(text)
+
+# work out the format from the file name
+def guess_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.ndjson') or name.endswith('.jsonl'):
+        return 'ndjson'
+    if name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+# check one row with the same rules as add_result
+# returns the row to insert or an error message
+def check_row(row, athletes, events, taken, types=None):
+    ath_id = str(row.get('athlete_id') or '').strip()
+    ev_id = str(row.get('event_id') or '').strip()
+    status = str(row.get('status') or '').strip()
+
+    try:
+        result = float(row.get('result'))
+    except (TypeError, ValueError):
+        return None, "Result must be a number"
+    if result <= 0:
+        return None, "Result must be a number larger than 0"
+    if status not in STATUSES:
+        return None, f"Invalid status '{status}'"
+
+    athlete = athletes.get(ath_id)
+    event = events.get(ev_id)
+    if not athlete:
+        return None, f"Athlete ID {ath_id} not found"
+    if not event:
+        return None, f"Event ID {ev_id} not found"
+    if athlete != event[:2]:
+        return None, "Sex/grade mismatch between athlete & event"
+    if event[2] == 'Not yet started':
+        return None, "Cannot add result to an event that has not started"
+    event_type = (types or {}).get(event[3])
+    result = event_types.round_result(event_type, result)
+    range_error = event_types.check_result(event_type, result)
+    if range_error:
+        return None, range_error
+    if (ath_id, ev_id) in taken:
+        return None, "Result already exists for this athlete and event"
+
+    taken.add((ath_id, ev_id))
+    return (ath_id, ev_id, result, status), None
+
+# import results from a stream of dict rows in one transaction
+# bad rows are reported and skipped, the rest of the batch still goes in
+# returns (rows inserted, rows rejected, [(row number, error)], ids of the events written)
+def import_results(db, rows, types=None, before_commit=None):
+    # lookup tables are loaded once for the whole file
+    athletes = {r['athlete_id']: (r['sex'], r['grade'])
+                for r in db.execute("SELECT athlete_id, sex, grade FROM Athletes")}
+    events = {r['event_id']: (r['sex'], r['grade'], r['status'], r['event'])
+              for r in db.execute("SELECT event_id, sex, grade, status, event FROM Events")}
+    taken = {(r['athlete_id'], r['event_id'])
+             for r in db.execute("SELECT athlete_id, event_id FROM results")}
+
+    inserted = 0
+    failed = 0
+    errors = []
+    event_ids = set()
+    batch = []
+
+    def flush():
+        db.executemany(
+            "INSERT INTO results(athlete_id,event_id,result,status) VALUES (?,?,?,?)", batch
+        )
+        batch.clear()
+
+    try:
+        for number, row in enumerate(rows, start=1):
+            if isinstance(row, UnreadableRow):
+                values, error = None, row.error
+            elif not isinstance(row, dict):
+                values, error = None, "Row must be an object"
+            else:
+                values, error = check_row(row, athletes, events, taken, types)
+            if error:
+                failed += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append((number, error))
+                continue
+
+            batch.append(values)
+            event_ids.add(values[1])
+            inserted += 1
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+        # lets the caller update anything derived from the events in the same transaction
+        if before_commit:
+            before_commit(event_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return inserted, failed, errors, event_ids
@@ -0,0 +1,92 @@
+import asyncio
+import queue
+import threading
+
+# one connected client, messages wait in a bounded queue
+class Subscription:
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.dropped = False
+
+    # next message, or None when nothing arrived within the timeout
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    # queue a message from the publishing thread, False when the client fell behind
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            return False
+        return True
+
+# a client served by an asyncio event loop
+# the publisher runs on a request thread, so messages are handed over to the loop
+class AsyncSubscription:
+    __slots__ = ('queue', 'dropped', 'loop')
+
+    def __init__(self, size, loop):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.dropped = False
+        self.loop = loop
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+
+    def offer(self, message):
+        if self.queue.full():
+            return False
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # the loop is gone
+            return False
+        return True
+
+# in-process publish / subscribe for live result updates
+# a message is encoded once by the publisher and shared by every subscriber
+class Broker:
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    # pass the running loop to subscribe from asyncio code
+    def subscribe(self, loop=None):
+        if loop is None:
+            subscription = Subscription(self.queue_size)
+        else:
+            subscription = AsyncSubscription(self.queue_size, loop)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if not subscription.offer(message):
+                # a client that stopped reading is cut off, its browser reconnects
+                subscription.dropped = True
+                self.unsubscribe(subscription)
@@ -0,0 +1,48 @@
+import contextlib
+import os
+import re
+import urllib.parse
+
+# past meets, one sqlite file each in the archive folder, named after the meet
+# the current meet stays in the app's own database, an archived one is only ATTACHed read-only
+# for the request that reads it
+EXTENSION = '.db'
+NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+
+def valid_name(name):
+    return bool(NAME.match(name))
+
+def path(folder, name):
+    return os.path.join(folder, name + EXTENSION)
+
+# archived meet names, newest file first
+def archived(folder):
+    try:
+        files = [f for f in os.listdir(folder) if f.endswith(EXTENSION) and valid_name(f[:-len(EXTENSION)])]
+    except FileNotFoundError:
+        return []
+    files.sort(key=lambda f: os.path.getmtime(os.path.join(folder, f)), reverse=True)
+    return [f[:-len(EXTENSION)] for f in files]
+
+# copy the current meet into the archive as one consistent file
+def archive(db, folder, name):
+    target = path(folder, name)
+    if os.path.exists(target):
+        raise FileExistsError(target)
+    os.makedirs(folder, exist_ok=True)
+    db.execute("VACUUM INTO ?", (target,))
+    return target
+
+# the archived meet attached read-only as schema meet_<name>, detached again afterwards
+# the caller must have read every row it wants before the block ends
+@contextlib.contextmanager
+def attached(db, folder, name):
+    if not valid_name(name) or not os.path.exists(path(folder, name)):
+        raise FileNotFoundError(name)
+    schema = 'meet_' + name.replace('-', '_')
+    uri = f"file:{urllib.parse.quote(os.path.abspath(path(folder, name)))}?mode=ro"
+    db.execute("ATTACH DATABASE ? AS " + schema, (uri,))
+    try:
+        yield schema
+    finally:
+        db.execute("DETACH DATABASE " + schema)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'etag', 'scope', 'expires'])
+
+# whether a page of this scope can show the event (a mapping of event, sex & grade)
+def matches(scope, event):
+    return all(not value or event[field] == value for field, value in scope.items())
+
+# an in-process LRU cache for rendered pages, bounded by size and age
+# each entry keeps the filters (scope) that decide which events it can show,
+# so a write only drops the entries that could contain the changed event
+class PageCache:
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # etags stay unique across restarts and worker processes
+        self._prefix = os.urandom(4).hex()
+        self._counter = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._forked)
+        # a counter shared with the other worker processes, bumped on every invalidation
+        self._shared = None
+        self._seen = 0
+        # the latest invalidations, (generation, event), event None for a whole clear
+        # a page rendered before one that matches it isn't stored
+        self._generation = 0
+        self._invalidations = deque(maxlen=64)
+
+    # a forked worker starts with the parent's entries & etag prefix
+    def _forked(self):
+        self._lock = threading.Lock()
+        self._entries.clear()
+        self._prefix = os.urandom(4).hex()
+
+    # share invalidations with other processes through a multiprocessing.Value
+    # a process that sees the counter move drops its whole cache
+    def share(self, counter):
+        with self._lock:
+            self._shared = counter
+            self._seen = counter.value
+
+    # called with self._lock held
+    def _sync(self, bump=False):
+        if self._shared is None:
+            return
+        with self._shared.get_lock():
+            if self._shared.value != self._seen:
+                self._entries.clear()
+                self._invalidated(None)
+            if bump:
+                self._shared.value += 1
+            self._seen = self._shared.value
+
+    # called with self._lock held
+    def _invalidated(self, event):
+        self._generation += 1
+        self._invalidations.append((self._generation, event))
+
+    # whether something invalidated since generation could have changed a page of this scope
+    # called with self._lock held
+    def _stale(self, generation, scope):
+        missed = self._generation - generation
+        if missed > len(self._invalidations):
+            return True
+        return any(
+            event is None or matches(scope, event)
+            for _, event in list(self._invalidations)[len(self._invalidations) - missed:]
+        )
+
+    # take before reading the data of a page, then hand to set()
+    def generation(self):
+        with self._lock:
+            self._sync()
+            return self._generation
+
+    def get(self, key):
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    # a page rendered from data read before generation was invalidated is returned but not kept
+    def set(self, key, value, scope, generation=None):
+        with self._lock:
+            self._sync()
+            self._counter += 1
+            entry = CacheEntry(value, f"{self._prefix}-{self._counter}", scope, time.monotonic() + self.ttl)
+            if generation is not None and self._stale(generation, scope):
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    # drop the entries whose scope matches the event (a mapping of event, sex & grade)
+    def invalidate(self, event):
+        with self._lock:
+            self._sync(bump=True)
+            self._invalidated(event)
+            stale = [key for key, entry in self._entries.items() if matches(entry.scope, event)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._sync(bump=True)
+            self._invalidated(None)
+            self._entries.clear()
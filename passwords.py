@@ -0,0 +1,123 @@
+import collections
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# every hashing worker is busy and the queue is full
+class HasherBusy(Exception):
+    pass
+
+# password hashing on a few worker threads, so a burst of logins
+# can't take every request thread with it
+class Hasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=32):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # the full parameter string werkzeug writes in front of the salt, e.g. scrypt:32768:8:1
+    # worked out by hashing once, on the first login instead of at import
+    @functools.cached_property
+    def prefix(self):
+        return generate_password_hash('', self.method).split('$', 1)[0]
+
+    def _submit(self, fn, *args):
+        # refuse straight away instead of queueing without limit
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='hasher')
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method)
+
+    def check(self, pwhash, password):
+        return self._submit(check_password_hash, pwhash, password)
+
+    # stored with other parameters than the configured ones
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    # stop the workers, a forked child starts its own on first use
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False)
+
+# failed logins per key (a username or an address) over a sliding window
+# max_keys is how many keys are kept before the expired ones are swept out
+class LoginLimiter:
+    def __init__(self, limit=5, window=300.0, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = {}
+        self._sweep_at = max_keys
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    # drop every key whose failures have all expired, keys that never come back would stay forever otherwise
+    def _sweep(self, now):
+        for key in list(self._failures):
+            self._recent(key, now)
+        # with that many keys still inside the window, wait until they double before sweeping again
+        self._sweep_at = max(self.max_keys, 2 * len(self._failures))
+
+    # seconds until key may try again, 0 when it may try now
+    def retry_after(self, *keys):
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in keys:
+                failures = self._recent(key, now)
+                if failures and len(failures) >= self.limit:
+                    wait = max(wait, failures[0] + self.window - now)
+        return wait
+
+    def failed(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                failures = self._recent(key, now)
+                if failures is None:
+                    failures = self._failures[key] = collections.deque()
+                failures.append(now)
+                # only the newest failures ever decide a lockout
+                while len(failures) > self.limit:
+                    failures.popleft()
+            if len(self._failures) > self._sweep_at:
+                self._sweep(now)
+
+    def succeeded(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._failures.clear()
+            self._sweep_at = self.max_keys
@@ -0,0 +1,150 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import tempfile
+
+import exporter
+import ranking
+
+# static copies of the results for kiosks & mirrors, served by any plain file server
+# every event has its own page & json, the filter pages group the events of one category or event name
+# the manifest keeps each event's checksum, a later run only rewrites what changed
+MANIFEST = 'manifest.json'
+STYLESHEET = 'style.css'
+
+# the columns a published row keeps, the event ones are on the event itself
+ROW_FIELDS = [f for f in exporter.FIELDS if f not in ('event_id', 'event', 'event_sex', 'event_grade')]
+
+def slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+# write to a temporary file next to the target, then rename it over the target
+# a reader sees the old file or the new one, never half of one
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def load_manifest(out):
+    try:
+        with open(os.path.join(out, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+# every event with its ranked rows, in one ranking pass
+def event_payloads(db):
+    events = db.execute("SELECT event_id, event, sex, grade, status FROM Events ORDER BY event_id").fetchall()
+    rows = itertools.groupby(ranking.ranked_results(db), key=lambda row: row['event_id'])
+    by_event = {event_id: [{f: row[f] for f in ROW_FIELDS} for row in group] for event_id, group in rows}
+    return {
+        e['event_id']: {
+            'event_id': e['event_id'],
+            'event': e['event'],
+            'sex': e['sex'],
+            'grade': e['grade'],
+            'status': e['status'],
+            'rows': by_event.get(e['event_id'], []),
+        }
+        for e in events
+    }
+
+def checksum(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+# the filter pages: one per sex & grade and one per event name, each with the event ids it shows
+def filter_pages(payloads):
+    pages = {}
+    for p in payloads.values():
+        category = f"{p['sex']} {p['grade']}"
+        pages.setdefault(f"category/{slug(category)}", (category, []))[1].append(p['event_id'])
+        pages.setdefault(f"event/{slug(p['event'])}", (p['event'], []))[1].append(p['event_id'])
+    return pages
+
+# render the pages of the events whose checksum changed since the last run
+# render(template, **context) returns the html, static is the app's static folder
+# full rewrites everything; returns the names of the files written & removed
+def publish(db, out, render, static, full=False):
+    old = load_manifest(out)
+    old_events = old.get('events', {})
+    payloads = event_payloads(db)
+    checksums = {event_id: checksum(p) for event_id, p in payloads.items()}
+    changed = {event_id for event_id, c in checksums.items() if full or old_events.get(event_id) != c}
+    removed_events = set(old_events) - set(payloads)
+
+    written = []
+    removed = []
+
+    def put(name, data):
+        write_atomic(os.path.join(out, *name.split('/')), data)
+        written.append(name)
+
+    def drop(name):
+        remove(os.path.join(out, *name.split('/')))
+        removed.append(name)
+
+    for event_id in sorted(changed):
+        p = payloads[event_id]
+        put(f"events/{event_id}.json", json.dumps(p, indent=1).encode('utf-8'))
+        put(f"events/{event_id}.html", render(
+            'snapshot_results.html', title=f"{p['event']} {p['sex']} {p['grade']}", events=[p], root='../'
+        ).encode('utf-8'))
+    for event_id in sorted(removed_events):
+        drop(f"events/{event_id}.json")
+        drop(f"events/{event_id}.html")
+
+    # a filter page is redone when any of its events changed, came or went
+    pages = filter_pages(payloads)
+    old_pages = old.get('pages', {})
+    for name, (title, event_ids) in sorted(pages.items()):
+        if not full and old_pages.get(name) == event_ids and not changed.intersection(event_ids):
+            continue
+        events = [payloads[event_id] for event_id in event_ids]
+        put(f"{name}.json", json.dumps(events, indent=1).encode('utf-8'))
+        put(f"{name}.html", render('snapshot_results.html', title=title, events=events, root='../').encode('utf-8'))
+    for name in sorted(set(old_pages) - set(pages)):
+        drop(f"{name}.json")
+        drop(f"{name}.html")
+
+    # the index lists every event & its status, it changes with any event
+    if changed or removed_events or not os.path.exists(os.path.join(out, 'index.html')):
+        categories = sorted((title, name) for name, (title, _) in pages.items() if name.startswith('category/'))
+        event_names = sorted((title, name) for name, (title, _) in pages.items() if name.startswith('event/'))
+        put('index.html', render(
+            'snapshot_index.html', events=list(payloads.values()), categories=categories, event_names=event_names, root=''
+        ).encode('utf-8'))
+
+    with open(os.path.join(static, STYLESHEET), 'rb') as f:
+        stylesheet = f.read()
+    try:
+        with open(os.path.join(out, STYLESHEET), 'rb') as f:
+            current = f.read()
+    except FileNotFoundError:
+        current = None
+    if current != stylesheet:
+        put(STYLESHEET, stylesheet)
+
+    # the manifest goes last, an interrupted run is redone by the next one
+    if written or removed:
+        put(MANIFEST, json.dumps({
+            'events': checksums,
+            'pages': {name: event_ids for name, (_, event_ids) in pages.items()},
+        }, indent=1, sort_keys=True).encode('utf-8'))
+    return written, removed
@@ -0,0 +1,199 @@
+import math
+
+import event_types
+
+# competition ranking done inside sqlite with window functions
+# ties share a rank, disqualified / not yet started results come last,
+# each event ranks in the direction of its event type, lowest time or highest distance first
+
+RANKED_RESULTS_SQL = """
+    SELECT * FROM (
+        SELECT
+            *,
+            CASE WHEN unranked THEN NULL
+                 ELSE RANK() OVER (PARTITION BY event_id ORDER BY unranked, sort_key)
+            END AS rank,
+            ROW_NUMBER() OVER (PARTITION BY event_id ORDER BY unranked, sort_key, result_id) AS position
+        FROM (
+            SELECT
+                r.result_id,
+                r.result,
+                CASE WHEN e.status = 'Completed' THEN r.status ELSE 'Not yet started' END AS status,
+                a.athlete_id,
+                a.name,
+                a.house,
+                e.event_id,
+                e.event,
+                e.sex AS event_sex,
+                e.grade AS event_grade,
+                e.status AS event_status,
+                CASE WHEN r.result IS NULL
+                       OR e.status != 'Completed'
+                       OR r.status IN ('Disqualified', 'Not yet started')
+                     THEN 1 ELSE 0
+                END AS unranked,
+                r.result * {direction} AS sort_key
+            FROM {schema}.results r
+            JOIN {schema}.Athletes a ON a.athlete_id = r.athlete_id
+            JOIN {schema}.Events e ON e.event_id = r.event_id
+            LEFT JOIN {schema}.event_types t ON t.event = e.event
+            WHERE {where}
+        )
+    )
+    WHERE {outer_where}
+    ORDER BY event_id, position
+"""
+
+# build the ranking sql for the filters
+# event / sex / grade / status narrow the field before ranking,
+# athlete_id only picks rows out of the ranked events
+# first_event / last_event limit ranking to a range of whole events,
+# after = a keyset cursor (see row_cursor) skips everything up to & including that row,
+# limit caps the rows returned
+# schema names an attached database (an archived meet) to rank instead of the current one
+def ranked_results_query(event='', sex='', grade='', status='', athlete_id='',
+                         first_event=None, last_event=None, after=None, limit=None, schema='main'):
+    where = ["1=1"]
+    params = []
+    outer_where = ["1=1"]
+    outer_params = []
+
+    if first_event is not None:
+        where.append("e.event_id >= ?")
+        params.append(first_event)
+    if last_event is not None:
+        where.append("e.event_id <= ?")
+        params.append(last_event)
+    if after:
+        outer_where.append("(event_id, unranked, sort_key IS NOT NULL, COALESCE(sort_key, 0), result_id) > (?, ?, ?, ?, ?)")
+        outer_params.extend(after)
+
+    if event:
+        where.append("e.event = ?")
+        params.append(event)
+    if sex:
+        where.append("a.sex = ?")
+        params.append(sex)
+    if grade:
+        where.append("a.grade = ?")
+        params.append(grade)
+    if status:
+        where.append("r.status = ?")
+        params.append(status)
+
+    if athlete_id:
+        # only rank the events this athlete took part in
+        where.append(f"r.event_id IN (SELECT event_id FROM {schema}.results WHERE athlete_id = ?)")
+        params.append(athlete_id)
+        outer_where.append("athlete_id = ?")
+        outer_params.append(athlete_id)
+
+    sql = RANKED_RESULTS_SQL.format(
+        schema=schema, where=" AND ".join(where), outer_where=" AND ".join(outer_where),
+        direction=event_types.direction_sql()
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        outer_params.append(limit)
+    return sql, params + outer_params
+
+# rank every result matching the filters
+def ranked_results(db, event='', sex='', grade='', status='', athlete_id='', schema='main'):
+    sql, params = ranked_results_query(event, sex, grade, status, athlete_id, schema=schema)
+    return db.execute(sql, params)
+
+# every ranked result of one event
+def event_results(db, event_id):
+    sql, params = ranked_results_query(first_event=event_id, last_event=event_id)
+    return db.execute(sql, params)
+
+# the next block of events a results page could draw from
+EVENT_WINDOW_SQL = """
+    SELECT event_id FROM {schema}.Events
+    WHERE event_id {op} ? AND {where}
+    ORDER BY event_id
+    LIMIT ?
+"""
+
+# the next limit events from start on (op is '>' or '>='), narrowed by the filters that belong to an event
+# athletes always match their event's sex & grade, so those filters also narrow the events
+def event_window_query(start, op, limit, event='', sex='', grade='', schema='main'):
+    where = ["1=1"]
+    params = []
+    if event:
+        where.append("event = ?")
+        params.append(event)
+    if sex:
+        where.append("sex = ?")
+        params.append(sex)
+    if grade:
+        where.append("grade = ?")
+        params.append(grade)
+    return EVENT_WINDOW_SQL.format(schema=schema, op=op, where=" AND ".join(where)), [start] + params + [limit]
+
+# the keyset cursor of a ranked row: the event & the row's place in the ranking order,
+# (event_id, unranked, has a result, result in the event's direction, result_id)
+# unlike a position it still points at the same row after results before it were added or changed
+def row_cursor(row):
+    sort_key = row['sort_key']
+    return (row['event_id'], row['unranked'], int(sort_key is not None), sort_key or 0.0, row['result_id'])
+
+# a cursor as it goes in a url, "<event_id>:<unranked>:<result in the event's direction>:<result_id>"
+# the result is left empty for a row without one
+def cursor_text(cursor):
+    event_id, unranked, has_result, sort_key, result_id = cursor
+    return f"{event_id}:{unranked}:{repr(float(sort_key)) if has_result else ''}:{result_id}"
+
+# the cursor in a url, None for the first page or anything that isn't one
+def parse_cursor(text):
+    parts = text.rsplit(':', 3)
+    if len(parts) != 4:
+        return None
+    event_id, unranked, sort_key, result_id = parts
+    if not event_id or unranked not in ('0', '1') or not result_id.isdigit():
+        return None
+    if not sort_key:
+        return (event_id, int(unranked), 0, 0.0, int(result_id))
+    try:
+        value = float(sort_key)
+    except ValueError:
+        return None
+    if not math.isfinite(value):
+        return None
+    return (event_id, int(unranked), 1, value, int(result_id))
+
+# one page of ranked results after the keyset cursor (see row_cursor)
+# returns the rows and the cursor of the next page, or None on the last page
+def ranked_page(db, page_size, after=None, event='', sex='', grade='', status='', athlete_id='', schema='main'):
+    start, op = (after[0], '>=') if after else ('', '>')
+    rows = []
+    while len(rows) <= page_size:
+        # a page never spans more than page_size events, so only those get ranked
+        window = [row[0] for row in db.execute(*event_window_query(start, op, page_size, event, sex, grade, schema))]
+        if not window:
+            break
+
+        rows.extend(db.execute(*ranked_results_query(
+            event, sex, grade, status, athlete_id,
+            first_event=window[0], last_event=window[-1], after=after, limit=page_size + 1 - len(rows), schema=schema
+        )))
+
+        if len(window) < page_size:
+            break
+        start, op = window[-1], '>'
+
+    if len(rows) > page_size:
+        return rows[:page_size], row_cursor(rows[page_size - 1])
+    return rows, None
+
+# group ranked rows into [((event_id, event, category), [rows]), ...] ordered by event_id
+def group_by_event(rows):
+    groups = []
+    last_event_id = None
+    for row in rows:
+        if row['event_id'] != last_event_id:
+            key = (row['event_id'], row['event'], f"{row['event_sex']} {row['event_grade']}")
+            groups.append((key, []))
+            last_event_id = row['event_id']
+        groups[-1][1].append(row)
+    return groups
@@ -0,0 +1,151 @@
+import event_types
+import meets
+
+# the best mark of every event / sex / grade across all meets
+# record_baseline holds the best of the archived meets and only changes when a meet is archived,
+# records is the better of the baseline & the current meet, redone for an event whenever its results are written
+COLUMNS = "event, sex, grade, result, athlete_id, name, house, meet, result_id"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS record_baseline (
+        event TEXT NOT NULL,
+        sex TEXT NOT NULL,
+        grade TEXT NOT NULL,
+        result REAL NOT NULL,
+        athlete_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        house TEXT NOT NULL,
+        meet TEXT NOT NULL,
+        result_id INTEGER,
+        PRIMARY KEY (event, sex, grade)
+    );
+    CREATE TABLE IF NOT EXISTS records (
+        event TEXT NOT NULL,
+        sex TEXT NOT NULL,
+        grade TEXT NOT NULL,
+        result REAL NOT NULL,
+        athlete_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        house TEXT NOT NULL,
+        meet TEXT,
+        result_id INTEGER,
+        PRIMARY KEY (event, sex, grade)
+    );
+    CREATE INDEX IF NOT EXISTS idx_records_result ON records(result_id);
+"""
+
+# the best ranked result of each event / sex / grade in one meet, meet is NULL for the current one
+# heats of the same event share a record
+BEST_SQL = """
+    SELECT event, sex, grade, result, athlete_id, name, house, ? AS meet, result_id, direction FROM (
+        SELECT
+            e.event, e.sex, e.grade, r.result, a.athlete_id, a.name, a.house, r.result_id,
+            {direction} AS direction,
+            ROW_NUMBER() OVER (
+                PARTITION BY e.event, e.sex, e.grade
+                ORDER BY r.result * {direction}, r.result_id
+            ) AS n
+        FROM {schema}.results r
+        JOIN {schema}.Athletes a ON a.athlete_id = r.athlete_id
+        JOIN {schema}.Events e ON e.event_id = r.event_id
+        LEFT JOIN {schema}.event_types t ON t.event = e.event
+        WHERE r.result IS NOT NULL AND r.status = 'Completed' AND e.status = 'Completed' AND {where}
+    )
+    WHERE n = 1
+"""
+
+def best_query(schema='main', meet=None, where="1=1", params=()):
+    return BEST_SQL.format(schema=schema, where=where, direction=event_types.direction_sql()), [meet, *params]
+
+def best(db, schema='main', meet=None, where="1=1", params=()):
+    return db.execute(*best_query(schema, meet, where, params)).fetchall()
+
+def better(row, than):
+    return than is None or row['result'] * row['direction'] < than['result'] * than['direction']
+
+def insert(db, table, rows):
+    db.executemany(
+        f"INSERT OR REPLACE INTO {table}({COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?)",
+        [tuple(row[c] for c in COLUMNS.split(", ")) for row in rows]
+    )
+
+def with_direction_query(table, where="1=1", params=()):
+    return f"""
+        SELECT b.*, {event_types.direction_sql('b.event')} AS direction
+        FROM {table} b
+        LEFT JOIN event_types t ON t.event = b.event
+        WHERE {where}
+    """, list(params)
+
+def with_direction(db, table, where="1=1", params=()):
+    return db.execute(*with_direction_query(table, where, params)).fetchall()
+
+# the statements update_event runs, an event's key is (event, sex, grade)
+EVENT_KEY_SQL = "SELECT event, sex, grade FROM Events WHERE event_id=?"
+BEST_WHERE = "e.event = ? AND e.sex = ? AND e.grade = ?"
+BASELINE_WHERE = "b.event = ? AND b.sex = ? AND b.grade = ?"
+DELETE_RECORD_SQL = "DELETE FROM records WHERE event = ? AND sex = ? AND grade = ?"
+
+# redo the record of the event / sex / grade an event belongs to
+# runs inside the caller's transaction, next to the write that changed the event
+def update_event(db, event_id):
+    event = db.execute(EVENT_KEY_SQL, (event_id,)).fetchone()
+    if event is None:
+        return
+    key = (event['event'], event['sex'], event['grade'])
+    current = best(db, where=BEST_WHERE, params=key)
+    baseline = with_direction(db, 'record_baseline', BASELINE_WHERE, key)
+    record = baseline[0] if baseline else None
+    if current and better(current[0], record):
+        record = current[0]
+    db.execute(DELETE_RECORD_SQL, key)
+    if record is not None:
+        insert(db, 'records', [record])
+
+# every record from the baseline & the whole current meet
+def rebuild(db):
+    records = {(r['event'], r['sex'], r['grade']): r for r in with_direction(db, 'record_baseline')}
+    for row in best(db):
+        key = (row['event'], row['sex'], row['grade'])
+        if better(row, records.get(key)):
+            records[key] = row
+    db.execute("DELETE FROM records")
+    insert(db, 'records', records.values())
+
+# the current records become the baseline of the next meet, the current meet's ones under its archive name
+def close_meet(db, name):
+    db.execute("DELETE FROM record_baseline")
+    db.execute(f"""
+        INSERT INTO record_baseline({COLUMNS})
+        SELECT event, sex, grade, result, athlete_id, name, house, COALESCE(meet, ?), NULL FROM records
+    """, (name,))
+
+# rebuild the baseline by reading every archived meet, one attached at a time
+# only needed when archive files were added or removed by hand
+def rebuild_baseline(db, folder):
+    records = {}
+    # oldest first, a later meet only takes a record by beating it
+    for name in reversed(meets.archived(folder)):
+        with meets.attached(db, folder, name) as schema:
+            rows = best(db, schema=schema, meet=name)
+        for row in rows:
+            key = (row['event'], row['sex'], row['grade'])
+            if better(row, records.get(key)):
+                records[key] = row
+    db.execute("DELETE FROM record_baseline")
+    insert(db, 'record_baseline', [dict(zip(r.keys(), r), result_id=None) for r in records.values()])
+    rebuild(db)
+
+# whether a result of the current meet holds its record, to flag a new one
+HOLDS_RECORD_SQL = "SELECT 1 FROM records WHERE result_id = ? AND meet IS NULL"
+
+def holds_record(db, result_id):
+    return db.execute(HOLDS_RECORD_SQL, (result_id,)).fetchone() is not None
+
+def all_records(db):
+    return db.execute("""
+        SELECT r.*, t.unit
+        FROM records r
+        LEFT JOIN event_types t ON t.event = r.event
+        ORDER BY r.event, r.sex, r.grade
+    """).fetchall()
@@ -0,0 +1,240 @@
+import threading
+from array import array
+
+import event_types
+
+# status codes kept per result, in the order the statuses are stored
+STATUSES = ('Completed', 'Not yet started', 'Disqualified')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+NOT_YET_STARTED = STATUS_CODES['Not yet started']
+
+# every result of the events asked for, with what the store needs to rank it
+EVENTS_SQL = """
+    SELECT e.event_id, e.event, e.sex, e.grade, e.status, {direction} AS direction
+    FROM Events e
+    LEFT JOIN event_types t ON t.event = e.event
+    WHERE {where}
+    ORDER BY e.event_id
+"""
+RESULTS_SQL = """
+    SELECT r.event_id, r.result_id, r.athlete_id, a.name, a.house, r.result, r.status
+    FROM results r
+    JOIN Athletes a ON a.athlete_id = r.athlete_id
+    WHERE {where}
+"""
+# one subquery each, sqlite only reads MIN or MAX off the primary key when it's alone in its select
+CHANGES_RANGE_SQL = "SELECT (SELECT MIN(seq) FROM result_changes), (SELECT MAX(seq) FROM result_changes)"
+CHANGED_EVENTS_SQL = "SELECT DISTINCT event_id FROM result_changes WHERE seq > ?"
+
+# the events & results sql for the given events, or every event when event_ids is None
+def load_queries(event_ids=None):
+    if event_ids is None:
+        event_where, result_where, params = "1=1", "1=1", []
+    else:
+        marks = ",".join("?" * len(event_ids))
+        event_where = f"e.event_id IN ({marks})"
+        result_where = f"r.event_id IN ({marks})"
+        params = list(event_ids)
+    events_sql = EVENTS_SQL.format(where=event_where, direction=event_types.direction_sql())
+    return (events_sql, params), (RESULTS_SQL.format(where=result_where), params)
+
+# one ranked row handed to the templates, built only for the rows on a page
+class StoredResult:
+    __slots__ = ('result_id', 'result', 'status', 'athlete_id', 'name', 'house', 'rank', 'position',
+                 'event_id', 'event', 'event_sex', 'event_grade', 'event_status')
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def keys(self):
+        return self.__slots__
+
+# the results of one event as parallel columns, kept in ranking order
+# ranks are worked out once when the event is loaded, not on every request
+class EventColumns:
+    __slots__ = ('event_id', 'event', 'sex', 'grade', 'status', 'direction', 'result_ids', 'athletes', 'results',
+                 'has_result', 'statuses', 'ranks')
+
+    def __init__(self, event_id, event, sex, grade, status, direction, rows):
+        self.event_id = event_id
+        self.event = event
+        self.sex = sex
+        self.grade = grade
+        self.status = status
+        self.direction = direction
+        completed = status == 'Completed'
+
+        # unranked rows last, then by result in the event's direction, then by id
+        # unranked rows without a result come first among them, as sqlite sorts NULL first
+        def sort_key(row):
+            result_id, _, result, code = row
+            unranked = result is None or not completed or code != 0
+            return (unranked, result is not None, 0 if result is None else result * direction, result_id)
+        rows.sort(key=sort_key)
+
+        self.result_ids = array('q')
+        self.athletes = array('i')
+        self.results = array('d')
+        self.has_result = array('b')
+        self.statuses = array('b')
+        self.ranks = array('i')
+        rank = 0
+        last_key = None
+        for position, (result_id, athlete, result, code) in enumerate(rows, start=1):
+            self.result_ids.append(result_id)
+            self.athletes.append(athlete)
+            self.results.append(0.0 if result is None else result)
+            self.has_result.append(result is not None)
+            self.statuses.append(code)
+            # competition ranking in the same pass, 0 for unranked rows
+            if result is None or not completed or code != 0:
+                self.ranks.append(0)
+            else:
+                if result != last_key:
+                    rank, last_key = position, result
+                self.ranks.append(rank)
+
+    # the keyset cursor of row i, the same as ranking.row_cursor gives for it
+    def cursor(self, i):
+        has_result = self.has_result[i]
+        sort_key = self.results[i] * self.direction if has_result else 0.0
+        return (self.event_id, int(self.ranks[i] == 0), int(has_result), sort_key, self.result_ids[i])
+
+# the ranked results of every event, loaded from sqlite and kept in memory
+# writes are picked up from the result_changes log, only the events that changed are reloaded,
+# so every process sees writes made by the others
+class ResultStore:
+    def __init__(self):
+        # (events, event ids in order, interned athletes, athlete_id -> index), swapped in as one
+        # so a reader never pairs the events of one load with the athletes of another
+        # athletes: index -> (athlete_id, name, house)
+        self._state = ({}, [], [], {})
+        self._seq = None
+        self._lock = threading.Lock()
+
+    # an incremental load only appends to (or renames in) the athletes the current events point into
+    def _intern(self, athletes, athlete_index, athlete_id, name, house):
+        index = athlete_index.get(athlete_id)
+        if index is None or athletes[index][1:] != (name, house):
+            if index is None:
+                index = athlete_index[athlete_id] = len(athletes)
+                athletes.append(None)
+            athletes[index] = (athlete_id, name, house)
+        return index
+
+    # (re)load the given events, or every event when event_ids is None
+    def _load(self, db, event_ids=None):
+        current, _, athletes, athlete_index = self._state
+        if event_ids is None:
+            # a full load interns into new lists, the old events keep their own
+            athletes, athlete_index = [], {}
+        events_query, results_query = load_queries(event_ids)
+        events = db.execute(*events_query).fetchall()
+
+        rows = {event['event_id']: [] for event in events}
+        results = db.execute(*results_query)
+        for event_id, result_id, athlete_id, name, house, result, status in results:
+            index = self._intern(athletes, athlete_index, athlete_id, name, house)
+            rows[event_id].append((result_id, index, result, STATUS_CODES[status]))
+
+        loaded = {
+            event['event_id']: EventColumns(*event, rows[event['event_id']])
+            for event in events
+        }
+        # readers keep using the old state until the new one is swapped in
+        if event_ids is not None:
+            merged = dict(current)
+            for event_id in event_ids:
+                merged.pop(event_id, None)
+            merged.update(loaded)
+            loaded = merged
+        self._state = (loaded, sorted(loaded), athletes, athlete_index)
+
+    # catch up with the writes logged since the last call
+    def refresh(self, db):
+        with self._lock:
+            first, last = db.execute(CHANGES_RANGE_SQL).fetchone()
+            if self._seq is None or (last or 0) < self._seq or (first is not None and first > self._seq + 1):
+                # first use, a rebuilt database or a log pruned past our position
+                self._load(db)
+            elif last != self._seq:
+                changed = [row[0] for row in db.execute(CHANGED_EVENTS_SQL, (self._seq,))]
+                self._load(db, changed)
+            self._seq = last or 0
+
+    def clear(self):
+        with self._lock:
+            self._state = ({}, [], [], {})
+            self._seq = None
+
+    def _row(self, athletes, columns, i, position):
+        row = StoredResult()
+        athlete_id, name, house = athletes[columns.athletes[i]]
+        code = columns.statuses[i]
+        row.result_id = columns.result_ids[i]
+        row.result = columns.results[i] if columns.has_result[i] else None
+        row.status = STATUSES[code] if columns.status == 'Completed' else STATUSES[NOT_YET_STARTED]
+        row.athlete_id = athlete_id
+        row.name = name
+        row.house = house
+        row.rank = columns.ranks[i] or None
+        row.position = position
+        row.event_id = columns.event_id
+        row.event = columns.event
+        row.event_sex = columns.sex
+        row.event_grade = columns.grade
+        row.event_status = columns.status
+        return row
+
+    # the ranked rows of one event matching the filters, numbered like ranking.ranked_results
+    # with their cursors, after skips the rows up to & including that cursor
+    def _event_rows(self, athletes, columns, status_code, athlete_index, after=None):
+        position = 0
+        for i in range(len(columns.result_ids)):
+            if status_code is not None and columns.statuses[i] != status_code:
+                continue
+            position += 1
+            if athlete_index is not None and columns.athletes[i] != athlete_index:
+                continue
+            cursor = columns.cursor(i)
+            if after and cursor <= after:
+                continue
+            yield self._row(athletes, columns, i, position), cursor
+
+    # the same page as ranking.ranked_page, read from memory
+    def ranked_page(self, page_size, after=None, event='', sex='', grade='', status='', athlete_id=''):
+        status_code = STATUS_CODES.get(status) if status else None
+        if status and status_code is None:
+            return [], None
+        events, order, athletes, athlete_indexes = self._state
+        athlete_index = None
+        if athlete_id:
+            athlete_index = athlete_indexes.get(athlete_id)
+            if athlete_index is None:
+                return [], None
+
+        rows = []
+        cursors = []
+        for event_id in order:
+            if after and event_id < after[0]:
+                continue
+            columns = events[event_id]
+            if (event and columns.event != event) or (sex and columns.sex != sex) or (grade and columns.grade != grade):
+                continue
+            if athlete_index is not None and athlete_index not in columns.athletes:
+                continue
+            event_after = after if after and event_id == after[0] else None
+            for row, cursor in self._event_rows(athletes, columns, status_code, athlete_index, event_after):
+                rows.append(row)
+                cursors.append(cursor)
+                if len(rows) > page_size:
+                    return rows[:page_size], cursors[page_size - 1]
+        return rows, None
+
+    # every ranked row of one event
+    def event_results(self, event_id):
+        events, _, athletes, _ = self._state
+        columns = events.get(event_id)
+        if columns is None:
+            return []
+        return [row for row, _ in self._event_rows(athletes, columns, None, None)]
@@ -0,0 +1,163 @@
+import itertools
+
+import event_types
+import ranking
+
+# points for 1st, 2nd, 3rd ... place, any place after the list scores nothing
+# athletes tied on a place both take its points
+POINTS_PER_PLACE = (8, 6, 5, 4, 3, 2, 1)
+
+def points_for(rank, points_per_place):
+    if rank is None or rank > len(points_per_place):
+        return 0
+    return points_per_place[rank - 1]
+
+def add_points(db, athlete_totals, house_totals):
+    db.executemany("""
+        INSERT INTO athlete_points(athlete_id, house, points) VALUES (?,?,?)
+        ON CONFLICT(athlete_id) DO UPDATE SET points = points + excluded.points
+    """, [(athlete_id, house, points) for (athlete_id, house), points in athlete_totals.items() if points])
+    db.executemany("""
+        INSERT INTO house_points(house, points) VALUES (?,?)
+        ON CONFLICT(house) DO UPDATE SET points = points + excluded.points
+    """, [(house, points) for house, points in house_totals.items() if points])
+
+# the statements rescore_event runs besides the ranking, by event_id
+EVENT_POINTS_SQL = "SELECT result_id, athlete_id, house, points FROM event_points WHERE event_id=?"
+DELETE_EVENT_POINTS_SQL = "DELETE FROM event_points WHERE event_id=?"
+DELETE_EVENT_RANKS_SQL = "DELETE FROM result_ranks WHERE event_id=?"
+
+# re-rank one event and move the difference in its points onto the athlete & house totals
+# runs inside the caller's transaction, next to the write that changed the event
+def rescore_event(db, event_id, points_per_place=POINTS_PER_PLACE):
+    old = db.execute(EVENT_POINTS_SQL, (event_id,)).fetchall()
+    new = []
+    ranks = []
+    for row in ranking.event_results(db, event_id):
+        ranks.append((row['result_id'], event_id, row['athlete_id'], row['rank'], row['position']))
+        points = points_for(row['rank'], points_per_place)
+        if points:
+            new.append((row['result_id'], event_id, row['athlete_id'], row['house'], points))
+
+    athlete_totals = {}
+    house_totals = {}
+    changes = [(r['athlete_id'], r['house'], -r['points']) for r in old]
+    changes += [(athlete_id, house, points) for _, _, athlete_id, house, points in new]
+    for athlete_id, house, points in changes:
+        athlete_totals[athlete_id, house] = athlete_totals.get((athlete_id, house), 0) + points
+        house_totals[house] = house_totals.get(house, 0) + points
+
+    db.execute(DELETE_EVENT_POINTS_SQL, (event_id,))
+    db.executemany("INSERT INTO event_points VALUES (?,?,?,?,?)", new)
+    add_points(db, athlete_totals, house_totals)
+
+    # the event's ranks in the per-athlete index
+    db.execute(DELETE_EVENT_RANKS_SQL, (event_id,))
+    db.executemany("INSERT INTO result_ranks VALUES (?,?,?,?,?)", ranks)
+
+# rebuild every total from scratch with one ranking pass over all events
+def rescore_all(db, points_per_place=POINTS_PER_PLACE):
+    db.execute("DELETE FROM event_points")
+    db.execute("DELETE FROM result_ranks")
+    db.execute("DELETE FROM athlete_points")
+    db.execute("UPDATE house_points SET points = 0")
+    db.execute("INSERT OR IGNORE INTO house_points(house, points) SELECT DISTINCT house, 0 FROM Athletes")
+
+    rows = ranking.ranked_results(db)
+    while True:
+        batch = list(itertools.islice(rows, 10000))
+        if not batch:
+            break
+        db.executemany("INSERT INTO result_ranks VALUES (?,?,?,?,?)", [
+            (row['result_id'], row['event_id'], row['athlete_id'], row['rank'], row['position'])
+            for row in batch
+        ])
+        db.executemany("INSERT INTO event_points VALUES (?,?,?,?,?)", [
+            (row['result_id'], row['event_id'], row['athlete_id'], row['house'], points_for(row['rank'], points_per_place))
+            for row in batch if row['rank'] is not None and row['rank'] <= len(points_per_place)
+        ])
+
+    db.execute("""
+        INSERT INTO athlete_points(athlete_id, house, points)
+        SELECT athlete_id, house, SUM(points) FROM event_points GROUP BY athlete_id
+    """)
+    db.execute("""
+        UPDATE house_points SET points = (
+            SELECT COALESCE(SUM(points), 0) FROM event_points WHERE event_points.house = house_points.house
+        )
+    """)
+
+# keep the totals in step with the configured points table
+# a table that differs from the stored one (or a database that has none yet) rebuilds everything
+def sync_points_table(db, points_per_place=POINTS_PER_PLACE):
+    stored = [row[0] for row in db.execute("SELECT points FROM points_table ORDER BY place")]
+    if stored == list(points_per_place):
+        return False
+    db.execute("DELETE FROM points_table")
+    db.executemany(
+        "INSERT INTO points_table(place, points) VALUES (?,?)",
+        list(enumerate(points_per_place, start=1))
+    )
+    rescore_all(db, points_per_place)
+    return True
+
+# house standings, best first, with tied houses sharing a place
+def house_standings(db):
+    return db.execute("""
+        SELECT house, points, RANK() OVER (ORDER BY points DESC) AS place
+        FROM house_points
+        ORDER BY points DESC, house
+    """).fetchall()
+
+# the top scoring athletes
+TOP_ATHLETES_SQL = """
+    SELECT p.athlete_id, a.name, p.house, p.points
+    FROM athlete_points p
+    JOIN Athletes a ON a.athlete_id = p.athlete_id
+    WHERE p.points > 0
+    ORDER BY p.points DESC, p.athlete_id
+    LIMIT ?
+"""
+
+def top_athletes(db, limit=10):
+    return db.execute(TOP_ATHLETES_SQL, (limit,)).fetchall()
+
+# every result of one athlete with its rank, read from the per-athlete index
+# costs one index range over that athlete's rows, the events aren't re-ranked
+ATHLETE_RESULTS_SQL = """
+    SELECT
+        k.result_id,
+        r.result,
+        CASE WHEN e.status = 'Completed' THEN r.status ELSE 'Not yet started' END AS status,
+        k.rank,
+        k.position,
+        COALESCE(p.points, 0) AS points,
+        e.event_id,
+        e.event,
+        e.sex AS event_sex,
+        e.grade AS event_grade,
+        e.status AS event_status,
+        {direction} AS direction,
+        t.unit
+    FROM result_ranks k
+    JOIN results r ON r.result_id = k.result_id
+    JOIN Events e ON e.event_id = k.event_id
+    LEFT JOIN event_types t ON t.event = e.event
+    LEFT JOIN event_points p ON p.result_id = k.result_id
+    WHERE k.athlete_id = ?
+    ORDER BY k.event_id
+""".format(direction=event_types.direction_sql())
+
+def athlete_results(db, athlete_id):
+    return db.execute(ATHLETE_RESULTS_SQL, (athlete_id,)).fetchall()
+
+# the best ranked result per event name, in the event's direction
+def personal_bests(rows):
+    best = {}
+    for row in rows:
+        if row['rank'] is None:
+            continue
+        current = best.get(row['event'])
+        if current is None or row['result'] * row['direction'] < current['result'] * current['direction']:
+            best[row['event']] = row
+    return {event: row['result_id'] for event, row in best.items()}
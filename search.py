@@ -0,0 +1,81 @@
+import re
+
+# full text indexes over athlete ids & names and event names
+# both read their text from the tables themselves (external content), the triggers keep them in step
+# prefix indexes make the typeahead's "jo"* style queries a single index lookup
+SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS athletes_fts USING fts5(
+        athlete_id, name,
+        content='Athletes', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        event,
+        content='Events', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS athletes_fts_insert AFTER INSERT ON Athletes BEGIN
+        INSERT INTO athletes_fts(rowid, athlete_id, name) VALUES (NEW.rowid, NEW.athlete_id, NEW.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS athletes_fts_delete AFTER DELETE ON Athletes BEGIN
+        INSERT INTO athletes_fts(athletes_fts, rowid, athlete_id, name) VALUES ('delete', OLD.rowid, OLD.athlete_id, OLD.name);
+    END;
+    CREATE TRIGGER IF NOT EXISTS athletes_fts_update AFTER UPDATE OF athlete_id, name ON Athletes BEGIN
+        INSERT INTO athletes_fts(athletes_fts, rowid, athlete_id, name) VALUES ('delete', OLD.rowid, OLD.athlete_id, OLD.name);
+        INSERT INTO athletes_fts(rowid, athlete_id, name) VALUES (NEW.rowid, NEW.athlete_id, NEW.name);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON Events BEGIN
+        INSERT INTO events_fts(rowid, event) VALUES (NEW.rowid, NEW.event);
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON Events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, event) VALUES ('delete', OLD.rowid, OLD.event);
+    END;
+    CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF event ON Events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, event) VALUES ('delete', OLD.rowid, OLD.event);
+        INSERT INTO events_fts(rowid, event) VALUES (NEW.rowid, NEW.event);
+    END;
+
+    INSERT INTO athletes_fts(athletes_fts) VALUES ('rebuild');
+    INSERT INTO events_fts(events_fts) VALUES ('rebuild');
+"""
+
+# in table order rather than by relevance, so a one letter prefix stops at the limit
+# instead of scoring every athlete it matches
+ATHLETES_SQL = """
+    SELECT a.athlete_id, a.name, a.house, a.sex, a.grade
+    FROM athletes_fts
+    JOIN Athletes a ON a.rowid = athletes_fts.rowid
+    WHERE athletes_fts MATCH ?
+    ORDER BY athletes_fts.rowid
+    LIMIT ?
+"""
+# event names repeat for every sex & grade, each name is suggested once
+EVENTS_SQL = """
+    SELECT e.event, COUNT(*) AS events
+    FROM events_fts
+    JOIN Events e ON e.rowid = events_fts.rowid
+    WHERE events_fts MATCH ?
+    GROUP BY e.event
+    ORDER BY MIN(events_fts.rank), e.event
+    LIMIT ?
+"""
+
+# turn what was typed into an fts query: every word must start a word of the match
+# words are quoted, so fts operators & punctuation in the input are plain text
+def match_query(text):
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+def athletes(db, text, limit=10):
+    query = match_query(text)
+    if not query:
+        return []
+    return db.execute(ATHLETES_SQL, (query, limit)).fetchall()
+
+def events(db, text, limit=10):
+    query = match_query(text)
+    if not query:
+        return []
+    return db.execute(EVENTS_SQL, (query, limit)).fetchall()
@@ -0,0 +1,102 @@
+# production launcher: one master, N pre-forked worker processes on a shared socket
+# usage: python serve.py --port 8000 --workers 4
+# the app, its templates & the database check are loaded once in the master,
+# every worker starts from that copy and opens its own connections
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+# preload: the app is imported once in the master, main() warms it up before forking
+import app as sports_app
+
+app = sports_app.app
+
+def run_worker(sock, host, port):
+    # the master's connections & hashing threads don't survive the fork
+    sports_app.close_pools()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        sports_app.close_pools()
+
+def spawn(sock, host, port):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(sock, host, port)
+        except SystemExit as e:
+            code = e.code or 0
+        except BaseException:
+            logging.exception("worker crashed")
+            code = 1
+        os._exit(code)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sports day app with pre-forked workers.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    # GET requests can't write, so they read through mode=ro connections
+    app.config['DB_READONLY_READERS'] = True
+    app.config['DEBUG'] = False
+    # create or migrate the database & compile the templates, once for every worker
+    sports_app.warm_up()
+    # a write in one worker empties the page caches of the others
+    sports_app.pages.share(multiprocessing.Value('Q', 0))
+    # load the result store once, the workers start from the master's copy of its arrays
+    if app.config['RESULT_STORE']:
+        with app.app_context():
+            sports_app.results.refresh(sports_app.get_db())
+    sports_app.close_pools()
+    sports_app.hasher.shutdown()
+
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    print(f"serving on http://{args.host}:{args.port} with {args.workers} workers")
+
+    workers = {spawn(sock, args.host, args.port) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # replace workers that die, until asked to stop
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"worker {pid} exited with {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(0.5)
+            workers.add(spawn(sock, args.host, args.port))
+    sock.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+# every statement the routes run uses an index on a seeded database, same check as `flask check-query-plans`
+import pytest
+
+import app as sports_app
+
+QUERIES = list(sports_app.route_queries())
+
+@pytest.fixture(scope='module')
+def db(tmp_path_factory):
+    app = sports_app.app
+    database = app.config['DATABASE']
+    app.config['DATABASE'] = str(tmp_path_factory.mktemp('db') / 'sports_day.db')
+    try:
+        with app.app_context():
+            sports_app.init_db(seed=1)
+            yield sports_app.get_db()
+    finally:
+        app.config['DATABASE'] = database
+
+@pytest.mark.parametrize(
+    'route, sql, params', QUERIES,
+    ids=[f"{route}-{i}" for i, (route, _, _) in enumerate(QUERIES)]
+)
+def test_no_table_scans(db, route, sql, params):
+    assert sports_app.table_scans(db, sql, params) == []
@@ -0,0 +1,104 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# too many writes are already waiting for the writer
+class WriteQueueFull(Exception):
+    pass
+
+# group commit: every write runs on one writer thread,
+# the writes that queue up while a batch commits (or within the window) share the next transaction & fsync
+# each write gets its own savepoint, so a failing write is undone without failing the others
+class WriteQueue:
+    def __init__(self, pool, window=0.0, max_batch=64, max_pending=256):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.pid = os.getpid()
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sqlite-group-commit', daemon=True)
+                self._thread.start()
+
+    # fn(db, *args) on the writer connection, committed with whatever else is in its batch
+    # returns what fn returned or raises what it raised, once the batch is committed
+    def submit(self, fn, *args):
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((fn, args, future))
+        except queue.Full:
+            raise WriteQueueFull() from None
+        return future.result()
+
+    # the first write waits for the queue, the rest of the batch only for the window
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch and batch[-1] is not None:
+            try:
+                batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        done = []
+        db = None
+        try:
+            db = self.pool.acquire()
+            db.execute("BEGIN IMMEDIATE")
+            for number, (fn, args, future) in enumerate(batch):
+                savepoint = f"write_{number}"
+                db.execute(f"SAVEPOINT {savepoint}")
+                try:
+                    result = fn(db, *args)
+                except Exception as e:
+                    db.execute(f"ROLLBACK TO {savepoint}")
+                    db.execute(f"RELEASE {savepoint}")
+                    done.append((future, None, e))
+                else:
+                    db.execute(f"RELEASE {savepoint}")
+                    done.append((future, result, None))
+            db.commit()
+        except Exception as e:
+            # the commit (or the database) failed, none of the batch was written
+            for fn, args, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            # release rolls back whatever a failed batch left uncommitted
+            if db is not None:
+                self.pool.release(db)
+        for future, result, error in done:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # finish the queued writes & stop the thread, a forked child starts its own
+    def shutdown(self, wait=True):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            if wait:
+                thread.join()